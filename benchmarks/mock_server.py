@@ -0,0 +1,215 @@
+"""A local stand-in for api.myvoltalis.com and (classic.)myvoltalis.com.
+
+Legacy endpoints answer with the payloads recorded in dumps/ (response-{name}.bin)
+when there is one, and with a small synthetic payload otherwise.
+"""
+
+import json
+import os
+import random
+import re
+import threading
+import time
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DUMPS = os.path.join(os.path.dirname(HERE), "dumps")
+
+SITE_ID = 1
+MODULATORS = [
+    {"modulatorTypeId": 1, "values": {"2": {"csLinkId": 100 + i, "name": f"m{i}"}}}
+    for i in range(4)
+]
+AVAILABLE_MODE = {
+    "order": 1,
+    "dbId": 2,
+    "imageName": "eco",
+    "translationKey": "eco",
+    "isEnabled": True,
+    "idRefTypeModulator": 1,
+}
+LEGACY_PAYLOADS = {
+    "getModeList": {
+        "programmationModeList": [
+            {
+                "id": 3,
+                "name": "AllEco",
+                "type": 0,
+                "color": "#f13434",
+                "group": [],
+                "targets": [],
+            }
+        ]
+    },
+    "getSchedulerList": {
+        "schedulerList": [
+            {
+                "id": 4,
+                "name": "AllEco",
+                "isActive": True,
+                "isException": False,
+                "data": [],
+                "dayOfWeek": [{"idDay": day, "dayIsOn": True} for day in range(1, 8)],
+            }
+        ]
+    },
+    "availableProgrammationMode": {
+        "availableModesByModulatorType": {"1": [AVAILABLE_MODE]}
+    },
+    "getOnOffState": {"status": True},
+    "updateSchedulerConfig": {"schedulerId": 4},
+}
+WEEK_PATH = re.compile(r"/api/site/\d+/consumption/week/(\d{4}-\d{2}-\d{2})")
+
+
+def week_payload(first_day: date):
+    start = datetime(first_day.year, first_day.month, first_day.day)
+    consumptions = [
+        {
+            "stepTimestampInUtc": (start + timedelta(hours=hour)).strftime(
+                "%Y-%m-%dT%H:%M:%SZ"
+            ),
+            "totalConsumptionInWh": float(200 + hour % 24 * 10),
+        }
+        for hour in range(7 * 24)
+    ]
+    return {
+        "totalConsumption": sum(cons["totalConsumptionInWh"] for cons in consumptions),
+        "consumptions": consumptions,
+    }
+
+
+def recorded(name):
+    path = os.path.join(DUMPS, f"response-{name}.bin")
+    if os.path.exists(path):
+        with open(path, "rb") as fd:
+            return fd.read()
+    return None
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # headers and body are written separately, Nagle would delay the body
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, body=b"", content_type="application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+
+        server = self.server
+        server.count()
+        if server.latency:
+            time.sleep(server.latency * random.uniform(0.5, 1.5))
+        if server.error_rate and random.random() < server.error_rate:
+            return self._reply(503, b'{"error": "injected"}')
+
+        path = urlparse(self.path).path
+        if path.startswith(("/api/", "/auth/")):
+            payload = self._api(path)
+        else:
+            payload = self._legacy(path)
+        if payload is None:
+            return self._reply(204)
+        if not isinstance(payload, bytes):
+            payload = json.dumps(payload).encode("utf-8")
+        self._reply(200, payload)
+
+    def _api(self, path):
+        if path == "/auth/login":
+            return {"token": "benchmark-token"}
+        if path == "/auth/logout":
+            return None
+        if path == "/api/account/me":
+            return {
+                "defaultSite": {"id": SITE_ID, "address": "1 rue du Banc"},
+                "otherSites": [],
+            }
+        if path.endswith("/quicksettings"):
+            return [
+                {"id": i, "name": f"q{i}", "enabled": i == 1, "appliancesSettings": []}
+                for i in range(1, 4)
+            ]
+        if path.endswith("/managed-appliance"):
+            return [
+                {"id": i, "name": f"a{i}", "applianceType": "HEATER"}
+                for i in range(1, 5)
+            ]
+        week = WEEK_PATH.match(path)
+        if week:
+            return week_payload(date.fromisoformat(week.group(1)))
+        return {}
+
+    def _legacy(self, path):
+        if path == "/login":
+            return {
+                "loginToken": {
+                    "value": {"token": "benchmark-token", "subscriberId": 1}
+                },
+                "subscriber": {
+                    "siteList": [{"id": SITE_ID, "modulatorList": MODULATORS}]
+                },
+            }
+        name = path.rsplit("/", 1)[-1].split(".json")[0]
+        if name in ("updateOnOffEvent", "changeSchedulerState", "updateModeConfig"):
+            return {}
+        return recorded(name) or LEGACY_PAYLOADS.get(name, {})
+
+    do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+
+class MockVoltalisServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0.0, error_rate=0.0) -> None:
+        super().__init__(("127.0.0.1", port), Handler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self):
+        with self._lock:
+            self.requests += 1
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def environ(self):
+        # points both clients at this server
+        return {
+            "VOLTALIS_API_URL": self.url,
+            "VOLTALIS_LEGACY_URL": self.url,
+            "VOLTALIS_CLASSIC_URL": self.url,
+        }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    server = MockVoltalisServer(args.port, args.latency, args.error_rate)
+    print(f"serving on {server.url}")
+    server.serve_forever()
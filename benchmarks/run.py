@@ -0,0 +1,196 @@
+"""Benchmarks the main flows of voltalis-cli against a local mock server.
+
+    python benchmarks/run.py --iterations 20 --latency 0.02 --output results.json
+    python benchmarks/run.py --compare results.json
+
+Every flow runs in its own process, so that peak RSS is measured per flow.
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+USERNAME, PASSWORD = "benchmark", "benchmark"
+
+
+def flow_cli_main(options):
+    from voltalis import cli
+
+    return lambda: cli.main(USERNAME, PASSWORD)
+
+
+def flow_backfill(options):
+    from voltalis.pandas import get_consumption_stats_per_hour_as_dataframe
+
+    start = datetime(2022, 1, 1)
+    end = start + timedelta(days=options.backfill_days)
+    return lambda: get_consumption_stats_per_hour_as_dataframe(
+        USERNAME, PASSWORD, start, end
+    )
+
+
+def flow_legacy_main(options):
+    from voltalis.legacy import cli
+
+    return lambda: cli.main(USERNAME, PASSWORD)
+
+
+def flow_set_all_eco(options):
+    from voltalis.legacy import cli
+
+    return lambda: cli.set_all_eco(USERNAME, PASSWORD)
+
+
+FLOWS = {
+    "cli.main": flow_cli_main,
+    "pandas.backfill": flow_backfill,
+    "legacy.cli.main": flow_legacy_main,
+    "legacy.set_all_eco": flow_set_all_eco,
+}
+
+
+def percentile(durations, q):
+    if len(durations) < 2:
+        return durations[0]
+    return statistics.quantiles(durations, n=100, method="inclusive")[q - 1]
+
+
+def measure(name, options):
+    # runs in the child process
+    sys.path.insert(0, ROOT)
+    flow = FLOWS[name](options)
+    logging.disable(logging.INFO)
+
+    for _ in range(options.warmup):
+        flow()
+
+    durations = []
+    started = time.perf_counter()
+    for _ in range(options.iterations):
+        iteration_started = time.perf_counter()
+        flow()
+        durations.append(time.perf_counter() - iteration_started)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    flow()
+    _, peak_traced = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "iterations": options.iterations,
+        "throughput": options.iterations / elapsed,
+        "p50": percentile(durations, 50),
+        "p99": percentile(durations, 99),
+        "mean": statistics.mean(durations),
+        "peak_traced_bytes": peak_traced,
+        # kilobytes on Linux, bytes on macOS
+        "peak_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def run_flow(name, options, server):
+    arguments = [
+        sys.executable,
+        os.path.abspath(__file__),
+        "--child",
+        name,
+        "--iterations",
+        str(options.iterations),
+        "--warmup",
+        str(options.warmup),
+        "--backfill-days",
+        str(options.backfill_days),
+    ]
+    environ = dict(os.environ, **server.environ())
+    requests_before = server.requests
+    # the legacy flows write dumps/ in the working directory
+    with tempfile.TemporaryDirectory() as workdir:
+        completed = subprocess.run(
+            arguments, env=environ, cwd=workdir, capture_output=True, text=True
+        )
+    if completed.returncode:
+        return {"error": completed.stderr.strip().splitlines()[-1:]}
+    result = json.loads(completed.stdout)
+    runs = options.iterations + options.warmup + 1
+    result["requests_per_iteration"] = (server.requests - requests_before) / runs
+    return result
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as fd:
+        baseline = json.load(fd)
+    for name, result in results["flows"].items():
+        before = baseline.get("flows", {}).get(name)
+        if not before or "p50" not in before or "p50" not in result:
+            continue
+        ratio = result["p50"] / before["p50"]
+        print(
+            f"{name}: p50 {before['p50']:.4f}s -> {result['p50']:.4f}s ({ratio:.2f}x)"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--flows", nargs="*", default=list(FLOWS), choices=FLOWS)
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--backfill-days", type=int, default=365)
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--compare", metavar="BASELINE")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    options = parser.parse_args()
+
+    if options.child:
+        print(json.dumps(measure(options.child, options)))
+        return
+
+    sys.path.insert(0, HERE)
+    from mock_server import MockVoltalisServer
+
+    server = MockVoltalisServer(latency=options.latency, error_rate=options.error_rate)
+    server.start()
+    results = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "revision": subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+        ).stdout.strip(),
+        "python": platform.python_version(),
+        "config": {
+            "iterations": options.iterations,
+            "latency": options.latency,
+            "error_rate": options.error_rate,
+            "backfill_days": options.backfill_days,
+        },
+        "flows": {},
+    }
+    for name in options.flows:
+        results["flows"][name] = run_flow(name, options, server)
+        print(f"{name}: {json.dumps(results['flows'][name])}", file=sys.stderr)
+    server.shutdown()
+
+    with open(options.output, "w") as fd:
+        json.dump(results, fd, indent=2)
+    if options.compare:
+        compare(results, options.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Measures the cold start of the entry points, each in a fresh interpreter.
+
+python benchmarks/startup.py --repeat 20
+python benchmarks/startup.py --importtime voltalis.cli
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TARGETS = (
+    "voltalis",
+    "voltalis.cli",
+    "voltalis.legacy.cli",
+    "voltalis.daemon",
+    "voltalis.pandas",
+)
+# the number of modules loaded by the target, printed by the child
+PROBE = "import sys, {target}; print(len(sys.modules))"
+
+
+def measure(target, repeat):
+    environ = dict(os.environ, PYTHONPATH=ROOT)
+    baseline = subprocess.run(
+        [sys.executable, "-c", "import sys; print(len(sys.modules))"],
+        env=environ,
+        capture_output=True,
+        text=True,
+    )
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        completed = subprocess.run(
+            [sys.executable, "-c", PROBE.format(target=target)],
+            env=environ,
+            capture_output=True,
+            text=True,
+        )
+        durations.append(time.perf_counter() - started)
+        if completed.returncode:
+            return {"error": completed.stderr.strip().splitlines()[-1:]}
+    return {
+        "min": min(durations),
+        "median": statistics.median(durations),
+        "modules": int(completed.stdout) - int(baseline.stdout),
+    }
+
+
+def importtime(target, top):
+    # the modules taking the most time to import, themselves included
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        env=dict(os.environ, PYTHONPATH=ROOT),
+        capture_output=True,
+        text=True,
+    )
+    rows = []
+    for line in completed.stderr.splitlines()[1:]:
+        # import time:       469 |        469 | voltalis
+        self_us, cumulative_us, name = line.split(":", 1)[1].split("|")
+        rows.append((int(cumulative_us), int(self_us), name.rstrip()))
+    for cumulative_us, self_us, name in sorted(rows, reverse=True)[:top]:
+        print(f"{cumulative_us / 1000:8.1f}ms {self_us / 1000:8.1f}ms  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--targets", nargs="*", default=TARGETS)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--importtime", metavar="MODULE")
+    parser.add_argument("--top", type=int, default=20)
+    options = parser.parse_args()
+
+    if options.importtime:
+        importtime(options.importtime, options.top)
+        return
+
+    for target in options.targets:
+        result = measure(target, options.repeat)
+        if "error" in result:
+            print(f"{target:24} {result['error']}")
+            continue
+        print(
+            f"{target:24} min {result['min'] * 1000:6.1f}ms"
+            f"  median {result['median'] * 1000:6.1f}ms"
+            f"  {result['modules']:4} modules"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,7 @@ See:
 https://packaging.python.org/guides/distributing-packages-using-setuptools/
 https://github.com/pypa/sampleproject
 """
+
 from setuptools import setup, find_packages
 import pathlib
 
@@ -21,13 +22,26 @@ setup(
     long_description=long_description,
     long_description_content_type="text/markdown",
     packages=find_packages(),
+    python_requires=">=3.9",
     install_requires=[
-        "requests >= 1.11.1",
-        "requests_cache >= 0.9.8",
-        "python-dateutil >= 2.7.3",
+        "requests >= 2.26",
+        "urllib3 >= 1.26",
     ],
+    entry_points={
+        "console_scripts": ["voltalis = voltalis.__main__:main"],
+    },
     extras_require={
-        "dev": ["black", "isort", "ipython", "build", "twine", "python-json-logger"],
-        "build": ["requests", "python-dateutil" "requests_cache", "pandas"],
+        "dev": [
+            "black",
+            "isort",
+            "ipython",
+            "build",
+            "twine",
+            "python-json-logger",
+            "pytest",
+        ],
+        "async": ["aiohttp >= 3.8"],
+        "fast": ["orjson"],
+        "build": ["requests", "pandas"],
     },
 )
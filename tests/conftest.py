@@ -0,0 +1,27 @@
+import pytest
+
+
+class Clock(object):
+    # stands for the time module: time(), monotonic() and sleep() on a clock
+    # moved by hand
+    def __init__(self) -> None:
+        self.now = 1000.0
+        self.slept = []
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(request, monkeypatch):
+    # replaces the time module of the module named by CLOCKED in the test module
+    clock = Clock()
+    monkeypatch.setattr(request.module.CLOCKED, "time", clock)
+    return clock
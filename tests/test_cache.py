@@ -0,0 +1,91 @@
+import math
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import requests
+
+from voltalis import cache as cache_module
+from voltalis.cache import ResponseCache
+
+CLOCKED = cache_module
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), max_entries=2)
+    yield cache
+    cache.close()
+
+
+def response(content=b"{}", status=200):
+    response = requests.Response()
+    response.status_code = status
+    response.headers["Content-Type"] = "application/json"
+    response._content = content
+    return response
+
+
+def week_path(first_day):
+    return f"api/site/1/consumption/week/{first_day.isoformat()}"
+
+
+def test_mutations_and_auth_are_never_cached(cache):
+    assert cache.ttl_for("POST", "api/site/1/quicksettings") is None
+    assert cache.ttl_for("PUT", "api/site/1/quicksettings/2") is None
+    assert cache.ttl_for("GET", "api/site/1/programming/reset") is None
+    assert cache.ttl_for("GET", "auth/login") is None
+
+
+def test_ttl_depends_on_the_path(cache):
+    today = datetime.now(timezone.utc).date()
+
+    assert cache.ttl_for("GET", week_path(today - timedelta(days=30))) == math.inf
+    assert cache.ttl_for("GET", week_path(today - timedelta(days=3))) == 300
+    assert cache.ttl_for("GET", "api/site/1/quicksettings") == 60
+
+
+def test_get_returns_a_copy_of_the_stored_response(cache):
+    cache.set("user", "api/account/me", response(b'{"id": 1}'), 60)
+
+    cached = cache.get("user", "api/account/me")
+    assert cached.status_code == 200
+    assert cached.json() == {"id": 1}
+    assert cached.headers["content-type"] == "application/json"
+    assert cached.from_cache
+    assert cache.get("other", "api/account/me") is None
+
+
+def test_errors_are_not_stored(cache):
+    cache.set("user", "api/account/me", response(status=500), 60)
+
+    assert cache.get("user", "api/account/me") is None
+
+
+def test_entries_expire(cache, clock):
+    cache.set("user", "api/account/me", response(), 60)
+
+    clock.now += 61
+    assert cache.get("user", "api/account/me") is None
+
+
+def test_least_recently_used_entry_is_evicted(cache, clock):
+    cache.set("user", "a", response(), 60)
+    clock.now += 1
+    cache.set("user", "b", response(), 60)
+    clock.now += 1
+    assert cache.get("user", "a") is not None
+
+    clock.now += 1
+    cache.set("user", "c", response(), 60)
+    assert cache.get("user", "a") is not None
+    assert cache.get("user", "b") is None
+    assert cache.get("user", "c") is not None
+
+
+def test_invalidate_keeps_the_immutable_entries(cache):
+    cache.set("user", "a", response(), 60)
+    cache.set("user", "b", response(), math.inf)
+
+    cache.invalidate("user")
+    assert cache.get("user", "a") is None
+    assert cache.get("user", "b") is not None
@@ -0,0 +1,139 @@
+import math
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+import requests
+
+from voltalis.consumption import (
+    ConsumptionSeries,
+    ConsumptionStep,
+    fetch_consumptions,
+    plan_week_windows,
+)
+
+UTC = timezone.utc
+
+
+class FakeClient(object):
+    # hourly steps of 1 Wh, except the given ones; failing weeks answer 503
+    def __init__(self, values=None, failing=()) -> None:
+        self.values = values or {}
+        self.failing = set(failing)
+        self.calls = []
+
+    def consumption_stats_per_hour(self, site_id, day, check=False):
+        self.calls.append(day)
+        if day in self.failing:
+            response = requests.Response()
+            response.status_code = 503
+            if check:
+                response.raise_for_status()
+            return {"error": "unavailable"}
+        start = datetime(day.year, day.month, day.day, tzinfo=UTC)
+        steps = (start + timedelta(hours=hour) for hour in range(7 * 24))
+        return {
+            "consumptions": [
+                {
+                    "stepTimestampInUtc": step.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                    "totalConsumptionInWh": self.values.get(step, 1.0),
+                }
+                for step in steps
+            ]
+        }
+
+
+def test_plan_week_windows_uses_utc_days():
+    plus_two = timezone(timedelta(hours=2))
+
+    assert plan_week_windows(
+        datetime(2022, 1, 1, tzinfo=plus_two), datetime(2022, 1, 3, tzinfo=plus_two)
+    ) == [date(2021, 12, 31)]
+
+
+def test_steps_without_value_do_not_count_in_the_total():
+    missing = datetime(2022, 1, 1, 5, tzinfo=UTC)
+    cli = FakeClient(values={missing: None})
+
+    data = fetch_consumptions(cli, 1, date(2022, 1, 1), date(2022, 1, 2))
+    assert len(data["consumptions"]) == 24
+    assert data["totalConsumption"] == 23
+
+
+def test_failed_week_raises():
+    cli = FakeClient(failing={date(2022, 1, 8)})
+
+    with pytest.raises(requests.HTTPError):
+        fetch_consumptions(cli, 1, date(2022, 1, 1), date(2022, 1, 15))
+
+
+def test_series_total_skips_missing_steps():
+    series = ConsumptionSeries([ConsumptionStep(0, 1.0), ConsumptionStep(3600, None)])
+
+    assert math.isnan(series[1].wh)
+    assert series.total_wh == 1.0
+
+
+def test_failed_week_stays_missing_in_the_store(tmp_path):
+    from voltalis.store import ConsumptionStore
+
+    store = ConsumptionStore(str(tmp_path / "consumption.sqlite"))
+    start, end = date(2022, 1, 1), date(2022, 1, 22)
+    cli = FakeClient(failing={date(2022, 1, 8)})
+
+    with pytest.raises(requests.HTTPError):
+        fetch_consumptions(cli, 1, start, end, store=store)
+    # the first week is kept, the failed one and those after it are not
+    assert store.missing_intervals(1, start, end) == [
+        (datetime(2022, 1, 8, tzinfo=UTC), datetime(2022, 1, 22, tzinfo=UTC))
+    ]
+    assert len(store.load(1, start, end)) == 7 * 24
+
+    # once the backend recovers, only what is missing is fetched again
+    cli.failing.clear()
+    cli.calls.clear()
+    data = fetch_consumptions(cli, 1, start, end, store=store)
+    assert len(data["consumptions"]) == 21 * 24
+    assert store.missing_intervals(1, start, end) == []
+    assert date(2022, 1, 8) in cli.calls
+    store.close()
+
+
+def hourly_series(count):
+    return ConsumptionSeries(
+        ConsumptionStep(hour * 3600, float(hour)) for hour in range(count)
+    )
+
+
+def test_series_slices_are_series():
+    series = hourly_series(5)
+
+    part = series[1:3]
+    assert isinstance(part, ConsumptionSeries)
+    assert list(part) == [ConsumptionStep(3600, 1.0), ConsumptionStep(7200, 2.0)]
+    assert series[-1] == ConsumptionStep(4 * 3600, 4.0)
+
+
+def test_series_cannot_grow_under_a_numpy_view():
+    pytest.importorskip("numpy")
+    series = hourly_series(3)
+
+    timestamps, wh = series.to_numpy()
+    with pytest.raises(BufferError):
+        series.append(ConsumptionStep(3 * 3600, 3.0))
+    assert len(series.timestamps) == len(series.wh) == 3
+
+    del timestamps, wh
+    series.append(ConsumptionStep(3 * 3600, 3.0))
+    assert len(series) == 4
+
+
+def test_dataframe_shares_the_series_memory():
+    np = pytest.importorskip("numpy")
+    pytest.importorskip("pandas")
+    series = hourly_series(24)
+
+    frame = series.to_dataframe()
+    _, wh = series.to_numpy()
+    assert np.shares_memory(frame["watts"].to_numpy(), wh)
+    assert frame.index[1].isoformat() == "1970-01-01T01:00:00+00:00"
+    assert frame["watts"].sum() == series.total_wh
@@ -0,0 +1,66 @@
+from voltalis.daemon import Account, Daemon
+
+
+class FakeClient(object):
+    def __init__(self, failures=0) -> None:
+        self.token = None
+        self.failures = failures
+        self.logins = 0
+        self.closed = False
+
+    def login(self):
+        self.logins += 1
+        self.token = "token"
+
+    def site_ids(self):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("sites")
+        return [1, 2]
+
+    def close(self):
+        self.closed = True
+
+
+class Sink(object):
+    def __init__(self) -> None:
+        self.records = []
+        self.closed = False
+
+    def __call__(self, record):
+        self.records.append(record)
+
+    def close(self):
+        self.closed = True
+
+
+def account(cli):
+    account = Account({"username": "user", "password": "password"})
+    account.cli = cli
+    return account
+
+
+def test_site_discovery_is_retried_after_a_failure():
+    cli = FakeClient(failures=1)
+    user = account(cli)
+
+    try:
+        user.ensure_login()
+    except ConnectionError:
+        pass
+    assert user.site_ids is None
+
+    user.ensure_login()
+    assert user.site_ids == [1, 2]
+    assert cli.logins == 1
+
+
+def test_run_closes_the_clients_and_the_sink():
+    cli = FakeClient()
+    sink = Sink()
+    daemon = Daemon([account(cli)], sink=sink)
+    daemon.stop()
+
+    daemon.run()
+    assert cli.closed
+    assert sink.closed
@@ -0,0 +1,38 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from voltalis.legacy.dumps import (
+    BackgroundDumpSink,
+    FileDumpSink,
+    NullDumpSink,
+    default_dump_sink,
+)
+
+
+def test_nothing_is_dumped_without_the_directory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    assert isinstance(default_dump_sink(), NullDumpSink)
+    assert not os.path.exists("dumps")
+
+    os.mkdir("dumps")
+    sink = default_dump_sink()
+    assert isinstance(sink, BackgroundDumpSink)
+    sink.write("me", b"{}")
+    sink.close()
+    assert os.listdir("dumps") == ["response-me.bin"]
+
+
+def test_rotation_is_thread_safe(tmp_path):
+    sink = FileDumpSink(str(tmp_path), naming="hash", max_files=5)
+
+    with ThreadPoolExecutor(8) as executor:
+        list(
+            executor.map(
+                lambda index: sink.write("state", str(index).encode()), range(200)
+            )
+        )
+    assert len(os.listdir(tmp_path)) == 5
+    assert sorted(sink._written) == sorted(
+        str(tmp_path / name) for name in os.listdir(tmp_path)
+    )
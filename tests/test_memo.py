@@ -0,0 +1,125 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from voltalis import memo
+from voltalis.memo import SingleFlight, TTLCache
+
+CLOCKED = memo
+
+
+def test_ttl_cache_expires_entries(clock):
+    cache = TTLCache(ttl=10)
+    cache.set("a", 1)
+
+    clock.now += 9
+    assert cache.get("a") == 1
+    clock.now += 2
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_ttl_cache_evicts_the_least_recently_used(clock):
+    cache = TTLCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+def test_ttl_cache_computes_once(clock):
+    cache = TTLCache()
+    calls = []
+
+    def compute(value):
+        calls.append(value)
+        return value * 2
+
+    assert cache.get_or_compute("a", compute, 21) == 42
+    assert cache.get_or_compute("a", compute, 21) == 42
+    assert calls == [21]
+
+
+def test_ttl_cache_invalidate(clock):
+    cache = TTLCache()
+    for key in ("site:1", "site:2", "account"):
+        cache.set(key, key)
+
+    cache.invalidate(lambda key: key.startswith("site:"))
+    assert cache.get("site:1") is None
+    assert cache.get("account") == "account"
+    cache.invalidate()
+    assert len(cache) == 0
+
+
+@pytest.fixture
+def waiting(monkeypatch):
+    # the followers blocked on the call of a leader
+    waiting = []
+    wait = memo._Call.wait
+
+    def counted(call):
+        waiting.append(call)
+        return wait(call)
+
+    monkeypatch.setattr(memo._Call, "wait", counted)
+    return waiting
+
+
+def _run_with_followers(flight, function, followers, waiting):
+    # the leader calls function once every follower waits on its call
+    started = threading.Event()
+    release = threading.Event()
+
+    def leader_function():
+        started.set()
+        release.wait(5)
+        return function()
+
+    with ThreadPoolExecutor(followers + 1) as executor:
+        futures = [executor.submit(flight.do, "key", leader_function)]
+        started.wait(5)
+        futures += [
+            executor.submit(flight.do, "key", leader_function) for _ in range(followers)
+        ]
+        deadline = time.monotonic() + 5
+        while len(waiting) < followers and time.monotonic() < deadline:
+            time.sleep(0.001)
+        release.set()
+    return futures
+
+
+def test_single_flight_shares_one_call(waiting):
+    flight = SingleFlight()
+    calls = []
+
+    def function():
+        calls.append(1)
+        return "result"
+
+    futures = _run_with_followers(flight, function, 7, waiting)
+    assert [future.result() for future in futures] == ["result"] * 8
+    assert calls == [1]
+    assert flight._calls == {}
+
+
+def test_single_flight_raises_the_error_in_every_caller(waiting):
+    flight = SingleFlight()
+
+    def failing():
+        raise ValueError("boom")
+
+    futures = _run_with_followers(flight, failing, 3, waiting)
+    for future in futures:
+        with pytest.raises(ValueError, match="boom"):
+            future.result()
+    assert len(waiting) == 3
+    assert flight._calls == {}
+    # a later call runs again
+    assert flight.do("key", lambda: "ok") == "ok"
@@ -0,0 +1,127 @@
+import asyncio
+import threading
+
+import pytest
+import requests
+
+from voltalis import ratelimit
+from voltalis.ratelimit import AdaptiveConcurrency, HostLimiter, TokenBucket
+
+CLOCKED = ratelimit
+
+
+def response(status, retry_after=None):
+    response = requests.Response()
+    response.status_code = status
+    if retry_after is not None:
+        response.headers["Retry-After"] = retry_after
+    return response
+
+
+def test_limit_grows_by_one_per_window_of_healthy_responses(clock):
+    concurrency = AdaptiveConcurrency(initial=4)
+    for _ in range(4):
+        concurrency.acquire()
+        concurrency.release()
+
+    assert concurrency.limit == pytest.approx(5, abs=0.1)
+    assert concurrency.in_flight == 0
+
+
+def test_limit_is_capped_by_the_maximum(clock):
+    concurrency = AdaptiveConcurrency(initial=4, maximum=4)
+    concurrency.acquire()
+    concurrency.release()
+
+    assert concurrency.limit == 4
+
+
+def test_throttling_halves_the_limit_once_per_cooldown(clock):
+    concurrency = AdaptiveConcurrency(initial=16, cooldown=1.0)
+    for _ in range(3):
+        concurrency.acquire()
+        concurrency.release(throttled=True)
+    assert concurrency.limit == 8
+
+    clock.now += 1
+    concurrency.acquire()
+    concurrency.release(throttled=True)
+    assert concurrency.limit == 4
+
+
+def test_limit_never_drops_below_the_minimum(clock):
+    concurrency = AdaptiveConcurrency(initial=2, minimum=1, cooldown=0)
+    for _ in range(4):
+        concurrency.acquire()
+        concurrency.release(throttled=True)
+
+    assert concurrency.limit == 1
+
+
+def test_unhealthy_responses_do_not_grow_the_limit(clock):
+    concurrency = AdaptiveConcurrency(initial=4, latency_target=1.0)
+    assert not concurrency.is_healthy(500, 0.1)
+    assert not concurrency.is_healthy(200, 2.0)
+    assert concurrency.is_healthy(200, 0.5)
+
+    concurrency.acquire()
+    concurrency.release(healthy=False)
+    assert concurrency.limit == 4
+
+
+def test_host_limiter_decreases_on_429_and_honours_retry_after(clock):
+    limiter = HostLimiter(TokenBucket(None), AdaptiveConcurrency(initial=8))
+    with limiter.slot() as done:
+        done(response(429, retry_after="3"))
+
+    assert limiter.concurrency.limit == 4
+    limiter.bucket.acquire()
+    assert clock.slept == [3]
+
+
+def test_unlimited_bucket_does_not_wait(clock):
+    bucket = TokenBucket(None)
+    for _ in range(1000):
+        bucket.acquire()
+
+    assert clock.slept == []
+
+
+def test_bucket_spaces_the_requests_past_the_burst(clock):
+    bucket = TokenBucket(rate=10, burst=2)
+    for _ in range(4):
+        bucket.acquire()
+
+    assert sum(clock.slept) == pytest.approx(0.2)
+
+
+def test_coroutines_wait_for_a_slot_released_by_a_thread():
+    concurrency = AdaptiveConcurrency(initial=1)
+    concurrency.acquire()
+
+    async def main():
+        waiting = asyncio.ensure_future(concurrency.acquire_async())
+        await asyncio.sleep(0.01)
+        assert not waiting.done()
+        threading.Thread(target=concurrency.release).start()
+        await asyncio.wait_for(waiting, 5)
+
+    asyncio.run(main())
+    assert concurrency.in_flight == 1
+    assert concurrency._waiters == []
+
+
+def test_async_slot_decreases_on_503():
+    class Response(object):
+        status = 503
+        headers = {}
+
+    limiter = HostLimiter(TokenBucket(None), AdaptiveConcurrency(initial=8))
+
+    async def main():
+        async with limiter.async_slot() as done:
+            done(Response())
+
+    asyncio.run(main())
+    assert limiter.concurrency.limit == 4
+    assert limiter.concurrency.in_flight == 0
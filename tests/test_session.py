@@ -0,0 +1,44 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from voltalis.session import create_session
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Set-Cookie", "account=one; Path=/")
+        self.send_header("X-Cookie", self.headers.get("Cookie", ""))
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+    server.server_close()
+
+
+def test_session_keeps_no_cookie(url):
+    session = create_session()
+
+    first = session.get(url)
+    second = session.get(url)
+    assert first.cookies["account"] == "one"
+    assert len(session.cookies) == 0
+    assert second.headers["X-Cookie"] == ""
+
+
+def test_cookies_of_a_request_are_sent(url):
+    session = create_session()
+
+    response = session.get(url, cookies={"account": "two"})
+    assert response.headers["X-Cookie"] == "account=two"
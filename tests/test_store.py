@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from voltalis.store import ConsumptionStore
+
+UTC = timezone.utc
+
+
+def at(day, hour=0):
+    return datetime(2022, 1, day, hour, tzinfo=UTC)
+
+
+def steps(start, end):
+    hours = int((end - start).total_seconds() // 3600)
+    return [
+        {
+            "stepTimestampInUtc": (start + timedelta(hours=hour)).strftime(
+                "%Y-%m-%dT%H:%M:%SZ"
+            ),
+            "totalConsumptionInWh": float(hour),
+        }
+        for hour in range(hours)
+    ]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ConsumptionStore(str(tmp_path / "consumption.sqlite"))
+    yield store
+    store.close()
+
+
+def coverage(store, site_id=1):
+    return [
+        (datetime.fromtimestamp(start, UTC), datetime.fromtimestamp(end, UTC))
+        for start, end in store._coverage(site_id)
+    ]
+
+
+def test_empty_store_misses_everything(store):
+    assert store.missing_intervals(1, at(1), at(8)) == [(at(1), at(8))]
+
+
+def test_gaps_around_and_between_covered_intervals(store):
+    store.save(1, [(at(2), at(3)), (at(5), at(6))], [])
+
+    assert store.missing_intervals(1, at(1), at(8)) == [
+        (at(1), at(2)),
+        (at(3), at(5)),
+        (at(6), at(8)),
+    ]
+    assert store.missing_intervals(1, at(2), at(3)) == []
+    assert store.missing_intervals(1, at(2, 12), at(5, 12)) == [(at(3), at(5))]
+
+
+def test_coverage_is_per_site(store):
+    store.save(1, [(at(1), at(8))], [])
+
+    assert store.missing_intervals(1, at(1), at(8)) == []
+    assert store.missing_intervals(2, at(1), at(8)) == [(at(1), at(8))]
+
+
+def test_overlapping_and_adjacent_intervals_are_merged(store):
+    store.save(1, [(at(1), at(3))], [])
+    store.save(1, [(at(2), at(4)), (at(4), at(5))], [])
+    store.save(1, [(at(7), at(8))], [])
+
+    assert coverage(store) == [(at(1), at(5)), (at(7), at(8))]
+    assert store.missing_intervals(1, at(1), at(8)) == [(at(5), at(7))]
+
+
+def test_unsettled_hours_are_not_covered(store):
+    now = datetime.now(UTC).replace(minute=0, second=0, microsecond=0)
+    start = now - timedelta(days=3)
+    store.save(1, [(start, now)], steps(start, now))
+
+    # stored, but fetched again until they settle
+    assert len(store.load(1, start, now)) == 72
+    ((gap_start, gap_end),) = store.missing_intervals(1, start, now)
+    assert gap_end == now
+    assert now - store.settle <= gap_start < now - store.settle + timedelta(hours=1)
+
+
+def test_load_series_returns_the_saved_steps_in_order(store):
+    store.save(1, [(at(1), at(2))], list(reversed(steps(at(1), at(2)))))
+
+    series = store.load_series(1, at(1), at(2))
+    assert len(series) == 24
+    assert [step.time for step in series][:2] == [at(1, 0), at(1, 1)]
+    assert series.total_wh == sum(range(24))
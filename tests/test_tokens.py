@@ -0,0 +1,39 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from voltalis.tokens import Relogin, TokenStore, expires_at
+
+
+class FakeClient(object):
+    def __init__(self) -> None:
+        self.token = object()
+        self.logins = 0
+
+    def login(self, force=False):
+        time.sleep(0.01)
+        self.logins += 1
+        self.token = object()
+
+
+def test_threads_holding_the_same_stale_token_share_one_login():
+    cli = FakeClient()
+    relogin = Relogin(cli)
+    stale = cli.token
+
+    with ThreadPoolExecutor(16) as executor:
+        list(executor.map(lambda _: relogin(stale), range(64)))
+    assert cli.logins == 1
+
+    relogin(cli.token)
+    assert cli.logins == 2
+
+
+def test_token_store_round_trip(tmp_path):
+    store = TokenStore(str(tmp_path / "sessions.json"))
+
+    store.save("api:user", {"token": "opaque"})
+    session = store.load("api:user")
+    assert session["token"] == "opaque"
+    assert expires_at(session, "opaque", max_age=60) == session["obtained_at"] + 60
+    store.delete("api:user")
+    assert store.load("api:user") is None
@@ -0,0 +1,309 @@
+"""One CLI for both clients, writing one record per line to stdout.
+
+    python -m voltalis sites
+    python -m voltalis --format csv consumption --start 2022-01-01 --end 2022-02-01
+    python -m voltalis --site 1234 quicksettings enable 12
+    python -m voltalis off
+    python -m voltalis stream --port 8765
+
+Credentials come from --username/--password or VOLTALIS_USERNAME and
+VOLTALIS_PASSWORD. Sessions are kept in a token store between invocations.
+"""
+
+import argparse
+import csv
+import logging
+import os
+import queue
+import sys
+import threading
+from datetime import date, timedelta
+
+from .jsonlib import dumps
+from .tokens import DEFAULT_PATH, TokenStore
+
+
+class RecordWriter(object):
+    # columns: the CSV header, by default the keys of the first record
+    def __init__(self, fp, format="jsonl", flush=False, columns=None) -> None:
+        self.fp = fp
+        self.format = format
+        self.flush = flush
+        self.columns = columns
+        self._writer = None
+
+    def write(self, record: dict):
+        self._write(record)
+        if self.flush:
+            self.fp.flush()
+
+    def _write(self, record: dict):
+        if self.format == "jsonl":
+            self.fp.write(dumps(record) + "\n")
+            return
+        if self._writer is None:
+            self._writer = csv.DictWriter(
+                self.fp, fieldnames=list(self.columns or record), extrasaction="ignore"
+            )
+            self._writer.writeheader()
+        self._writer.writerow(
+            {
+                key: " ".join(map(str, value)) if isinstance(value, list) else value
+                for key, value in record.items()
+            }
+        )
+
+
+def _token_store(options):
+    if options.no_token_store:
+        return None
+    return TokenStore(options.token_store)
+
+
+def _client(options):
+    from .client import VoltalisClient
+
+    cli = VoltalisClient(
+        options.username, options.password, token_store=_token_store(options)
+    )
+    cli.login()
+    return cli
+
+
+def _legacy_client(options):
+    from .legacy import VoltalisClient
+    from .legacy.dumps import NullDumpSink
+
+    cli = VoltalisClient(
+        options.username,
+        options.password,
+        dump_sink=NullDumpSink(),
+        token_store=_token_store(options),
+    )
+    cli.login()
+    return cli
+
+
+def _for_each_site(site_ids, records):
+    # records(site_id) -> records; a failing site does not stop the others
+    for site_id in site_ids:
+        try:
+            yield from records(site_id)
+        except Exception as e:
+            logging.error(f"site {site_id}: {e!r}")
+            yield {"site_id": site_id, "error": repr(e)}
+
+
+def sites_command(options):
+    cli = _client(options)
+    for index, site in enumerate(cli.sites()):
+        if options.site and site["id"] not in options.site:
+            continue
+        yield {"id": site["id"], "address": site.get("address"), "default": index == 0}
+
+
+def consumption_command(options):
+    from .consumption import iter_consumption
+
+    cli = _client(options)
+
+    def records(site_id):
+        for step in iter_consumption(cli, site_id, options.start, options.end):
+            yield {"site_id": site_id, "time": step.time.isoformat(), "wh": step.wh}
+
+    yield from _for_each_site(options.site or cli.site_ids(), records)
+
+
+def quicksettings_list_command(options):
+    cli = _client(options)
+
+    def records(site_id):
+        for quicksetting in cli.get_quicksettings(site_id):
+            yield {
+                "site_id": site_id,
+                "id": quicksetting["id"],
+                "name": quicksetting.get("name"),
+                "enabled": quicksetting.get("enabled"),
+                "appliances": len(quicksetting.get("appliancesSettings", [])),
+            }
+
+    yield from _for_each_site(options.site or cli.site_ids(), records)
+
+
+def quicksettings_enable_command(options):
+    cli = _client(options)
+
+    def records(site_id):
+        quicksetting = cli.enable_quicksetting(site_id, options.quicksetting_id)
+        yield {
+            "site_id": site_id,
+            "id": options.quicksetting_id,
+            "enabled": (quicksetting or {}).get("enabled"),
+        }
+
+    yield from _for_each_site(options.site or cli.site_ids(), records)
+
+
+def appliances_command(options):
+    cli = _client(options)
+
+    def records(site_id):
+        for appliance in cli.get_managed_appliances(site_id):
+            yield {
+                "site_id": site_id,
+                "id": appliance["id"],
+                "name": appliance.get("name"),
+                "type": appliance.get("applianceType"),
+            }
+
+    yield from _for_each_site(options.site or cli.site_ids(), records)
+
+
+def switch_command(options):
+    cli = _legacy_client(options)
+    turn_on = options.command == "on"
+    for result in cli.switch_all(lambda modulator: turn_on, site_ids=options.site):
+        yield {
+            "site_id": result.site_id,
+            "status": result.status,
+            "modulators": result.modulators,
+            "error": repr(result.error) if result.error else None,
+        }
+
+
+def eco_command(options):
+    from .legacy import ReasonedVoltalisClient
+    from .legacy.cli import set_site_eco
+
+    cli = _legacy_client(options)
+    rcli = ReasonedVoltalisClient(cli)
+    sites = {site.uid: site for site in cli.sites()}
+
+    def records(site_id):
+        yield {"site_id": site_id, "scheduler_id": set_site_eco(rcli, sites[site_id])}
+
+    yield from _for_each_site(options.site or list(sites), records)
+
+
+def stream_command(options):
+    from .legacy.stream import serve_sse
+
+    cli = _legacy_client(options)
+    site_ids = options.site or [site.uid for site in cli.sites()]
+    streams = {site_id: cli.stream(site_id) for site_id in site_ids}
+    if options.port:
+        serve_sse(streams, options.port, allow_origin=options.allow_origin)
+        logging.warning(f"serving on http://127.0.0.1:{options.port}/events")
+        threading.Event().wait()
+
+    samples = queue.Queue()
+    for stream in streams.values():
+        stream.subscribe(samples.put)
+    while True:
+        yield samples.get().to_dict()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="voltalis")
+    parser.add_argument("--username", default=os.environ.get("VOLTALIS_USERNAME"))
+    parser.add_argument("--password", default=os.environ.get("VOLTALIS_PASSWORD"))
+    parser.add_argument("--format", choices=("jsonl", "csv"), default="jsonl")
+    parser.add_argument(
+        "--site",
+        type=int,
+        action="append",
+        help="a site id, can be repeated (default: every site of the account)",
+    )
+    parser.add_argument(
+        "--token-store",
+        default=os.environ.get("VOLTALIS_TOKEN_STORE", DEFAULT_PATH),
+    )
+    parser.add_argument("--no-token-store", action="store_true")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("sites").set_defaults(
+        run=sites_command, columns=("id", "address", "default")
+    )
+
+    consumption = commands.add_parser("consumption", help="hourly consumption")
+    consumption.add_argument(
+        "--start",
+        type=date.fromisoformat,
+        default=date.today() - timedelta(days=7),
+    )
+    consumption.add_argument("--end", type=date.fromisoformat, default=date.today())
+    consumption.set_defaults(
+        run=consumption_command, columns=("site_id", "time", "wh", "error")
+    )
+
+    quicksettings = commands.add_parser("quicksettings").add_subparsers(
+        dest="action", required=True
+    )
+    quicksettings.add_parser("list").set_defaults(
+        run=quicksettings_list_command,
+        columns=("site_id", "id", "name", "enabled", "appliances", "error"),
+    )
+    enable = quicksettings.add_parser("enable")
+    enable.add_argument("quicksetting_id", type=int)
+    enable.set_defaults(
+        run=quicksettings_enable_command, columns=("site_id", "id", "enabled", "error")
+    )
+
+    commands.add_parser("appliances").set_defaults(
+        run=appliances_command, columns=("site_id", "id", "name", "type", "error")
+    )
+    switch_columns = ("site_id", "status", "modulators", "error")
+    commands.add_parser("on", help="turn every modulator on").set_defaults(
+        run=switch_command, columns=switch_columns
+    )
+    commands.add_parser("off", help="turn every modulator off").set_defaults(
+        run=switch_command, columns=switch_columns
+    )
+    commands.add_parser("eco", help="activate the AllEco scheduler").set_defaults(
+        run=eco_command, columns=("site_id", "scheduler_id", "error")
+    )
+    stream = commands.add_parser(
+        "stream", help="real-time consumption, until interrupted"
+    )
+    stream.add_argument(
+        "--port", type=int, help="serve Server-Sent Events on localhost instead"
+    )
+    stream.add_argument(
+        "--allow-origin", help="a web origin allowed to read the served events"
+    )
+    stream.set_defaults(
+        run=stream_command, columns=("endpoint", "site_id", "time", "payload")
+    )
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    options = parser.parse_args(argv)
+    if not options.username or not options.password:
+        parser.error(
+            "--username and --password (or VOLTALIS_USERNAME and VOLTALIS_PASSWORD) are required"
+        )
+    logging.basicConfig(
+        level=logging.INFO if options.verbose else logging.WARNING, stream=sys.stderr
+    )
+
+    writer = RecordWriter(
+        sys.stdout,
+        options.format,
+        flush=options.command == "stream",
+        columns=options.columns,
+    )
+    failed = False
+    try:
+        for record in options.run(options):
+            failed = failed or bool(record.get("error"))
+            writer.write(record)
+    except KeyboardInterrupt:
+        return 130
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,211 @@
+import asyncio
+import logging
+from datetime import date
+
+import aiohttp
+
+from . import client, ratelimit
+from .client import is_mutation
+from .jsonlib import dumps, loads
+from .session import RETRY_STATUSES
+
+DEFAULT_TIMEOUT = aiohttp.ClientTimeout(total=None, connect=3.05, sock_read=30)
+
+
+def create_session(
+    limit=100, limit_per_host=0, keepalive_timeout=30, timeout=DEFAULT_TIMEOUT
+) -> aiohttp.ClientSession:
+    # the cookie jar is disabled so that one session can be shared between accounts
+    connector = aiohttp.TCPConnector(
+        limit=limit, limit_per_host=limit_per_host, keepalive_timeout=keepalive_timeout
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=timeout,
+        cookie_jar=aiohttp.DummyCookieJar(),
+        json_serialize=dumps,
+    )
+
+
+class AsyncVoltalisClient(object):
+    def __init__(
+        self,
+        username,
+        password,
+        log_response_callback=None,
+        session=None,
+        semaphore=None,
+        max_concurrency=100,
+        max_retries=3,
+        backoff_factor=0.5,
+        **session_options,
+    ) -> None:
+        self.username = username
+        self.password = password
+        self.common_cookies = {}
+        self.login_response = None
+        self.token = None
+        self.log_response_callback = log_response_callback
+        # session and semaphore can be shared by many clients (one per account)
+        self._owns_session = session is None
+        self.session = session
+        self.session_options = session_options
+        self.semaphore = semaphore or asyncio.Semaphore(max_concurrency)
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self._in_flight = {}
+
+    async def close(self):
+        if self._owns_session and self.session:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _call(self, path, method=None, json=None, authenticated=True):
+        method = method or ("POST" if json else "GET")
+        if is_mutation(method, path):
+            return await self._request(path, method, json, authenticated)
+
+        # coalesced as by memo.SingleFlight, on asyncio futures
+        key = (path, authenticated)
+        future = self._in_flight.get(key)
+        if future is None:
+            future = self._in_flight[key] = asyncio.ensure_future(
+                self._request(path, method, json, authenticated)
+            )
+            future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        # a cancelled caller does not cancel the request of the others
+        return await asyncio.shield(future)
+
+    async def _request(self, path, method, json, authenticated):
+        headers = {"Content-Type": "application/json"}
+        if authenticated:
+            headers["Authorization"] = f"Bearer {self.token}"
+        if self.session is None:
+            self.session = create_session(**self.session_options)
+
+        url = f"{client.API_URL}/{path}"
+        attempt = 0
+        while True:
+            # each attempt goes through the limiter of the host, shared with
+            # the other clients of the process
+            async with ratelimit.async_slot(url) as done, self.semaphore:
+                response = await self.session.request(
+                    method, url, json=json, headers=headers
+                )
+                done(response)
+                async with response:
+                    if (
+                        response.status not in RETRY_STATUSES
+                        or attempt >= self.max_retries
+                    ):
+                        body = await response.read()
+                        return response, loads(body) if body else None
+            # back off outside of the semaphore, not to block other requests
+            retry_after = response.headers.get("Retry-After", "")
+            delay = self.backoff_factor * (2**attempt)
+            if retry_after.isdigit():
+                delay = max(delay, int(retry_after))
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def _log_response(self, uri: str, response: aiohttp.ClientResponse):
+        if self.log_response_callback:
+            self.log_response_callback(uri, response)
+        if response.status > 299:
+            logging.warning(f"{uri} -> {response.status}")
+        else:
+            logging.info(f"{uri} -> {response.status}")
+
+    async def login(self):
+        data = {
+            "password": self.password,
+            "login": self.username,
+        }
+        response, payload = await self._call(
+            "auth/login", json=data, authenticated=False
+        )
+        self.login_response = response
+        self.common_cookies = {
+            name: morsel.value for name, morsel in response.cookies.items()
+        }
+        self._log_response("login", response)
+        self.token = payload.get("token")
+
+    async def me(self):
+        response, payload = await self._call("api/account/me")
+        self._log_response("me", response)
+        return payload
+
+    async def logout(self):
+        response, _ = await self._call("auth/logout", method="DELETE")
+        self._log_response("logout", response)
+
+    async def get_quicksettings(self, site_id: int):
+        response, payload = await self._call(f"api/site/{site_id}/quicksettings")
+        self._log_response("get_quicksettings", response)
+        return payload
+
+    async def get_quicksetting(self, site_id: int, quicksetting_id: int):
+        response, payload = await self._call(
+            f"api/site/{site_id}/quicksettings/{quicksetting_id}"
+        )
+        self._log_response("get_quicksetting", response)
+        return payload
+
+    async def put_quicksetting(
+        self, site_id: int, quicksetting_id: int, quicksetting: dict
+    ):
+        response, payload = await self._call(
+            f"api/site/{site_id}/quicksettings/{quicksetting_id}",
+            method="PUT",
+            json=quicksetting,
+        )
+        self._log_response("put_quicksetting", response)
+        return payload
+
+    async def enable_quicksetting(self, site_id: int, quicksetting_id: int):
+        json = {"enabled": True}
+        response, payload = await self._call(
+            f"api/site/{site_id}/quicksettings/{quicksetting_id}/enable",
+            method="PUT",
+            json=json,
+        )
+        self._log_response("enable_quicksetting", response)
+        return payload
+
+    async def get_managed_appliances(self, site_id: int):
+        response, payload = await self._call(f"api/site/{site_id}/managed-appliance")
+        self._log_response("get_managed_appliances", response)
+        return payload
+
+    async def reset(self, site_id: int):
+        response, _ = await self._call(f"api/site/{site_id}/programming/reset")
+        self._log_response("reset", response)
+
+    async def consumption_stats_per_hour(self, site_id: int, date: date):
+        date_formatted = date.strftime("%Y-%m-%d")
+
+        response, payload = await self._call(
+            f"api/site/{site_id}/consumption/week/{date_formatted}?aggregationType=BY_HOUR",
+        )
+        self._log_response(f"consumption_stats_per_hour-{date_formatted}", response)
+        return payload
+
+    async def site_ids(self):
+        me = await self.me()
+        sites = [me.get("defaultSite")] + me.get("otherSites", [])
+        return [site["id"] for site in sites if site]
+
+    async def for_each_site(self, method, site_ids, *args):
+        # e.g. await cli.for_each_site(cli.get_quicksettings, await cli.site_ids())
+        results = await asyncio.gather(
+            *[method(site_id, *args) for site_id in site_ids],
+            return_exceptions=True,
+        )
+        return dict(zip(site_ids, results))
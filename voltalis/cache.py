@@ -0,0 +1,125 @@
+import json
+import math
+import re
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from .client import is_mutation
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    owner TEXT NOT NULL,
+    path TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    content BLOB NOT NULL,
+    expires REAL NOT NULL,
+    accessed REAL NOT NULL,
+    PRIMARY KEY (owner, path)
+);
+CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed);
+"""
+
+WEEK_PATH = re.compile(r"/consumption/week/(\d{4}-\d{2}-\d{2})")
+
+
+class ResponseCache(object):
+    # GET responses of one or several clients, keyed by (owner, path).
+    # auth/* and mutations are never cached; past consumption weeks never
+    # expire; the least recently used entries are evicted past max_entries.
+    def __init__(
+        self,
+        path="voltalis-cache.sqlite",
+        max_entries=10000,
+        default_ttl=60,
+        recent_ttl=300,
+    ) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.recent_ttl = recent_ttl
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+
+    def close(self):
+        self._db.close()
+
+    def ttl_for(self, method: str, path: str) -> Optional[float]:
+        if is_mutation(method, path) or path.startswith("auth/"):
+            return None
+        week = WEEK_PATH.search(path)
+        if week:
+            first_day = date.fromisoformat(week.group(1))
+            today = datetime.now(timezone.utc).date()
+            # the whole week (plus a day of timezone slack) is in the past
+            if first_day + timedelta(days=8) <= today:
+                return math.inf
+            return self.recent_ttl
+        return self.default_ttl
+
+    def get(self, owner: str, path: str) -> Optional[requests.Response]:
+        now = time.time()
+        with self._lock, self._db:
+            row = self._db.execute(
+                "SELECT status, headers, content FROM responses"
+                " WHERE owner = ? AND path = ? AND expires > ?",
+                (owner, path, now),
+            ).fetchone()
+            if not row:
+                return None
+            self._db.execute(
+                "UPDATE responses SET accessed = ? WHERE owner = ? AND path = ?",
+                (now, owner, path),
+            )
+
+        status, headers, content = row
+        response = requests.Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict(json.loads(headers))
+        response._content = content
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.from_cache = True
+        return response
+
+    def set(self, owner: str, path: str, response: requests.Response, ttl: float):
+        if not 200 <= response.status_code < 300:
+            return
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    owner,
+                    path,
+                    response.status_code,
+                    json.dumps(dict(response.headers)),
+                    response.content,
+                    now + ttl,
+                    now,
+                ),
+            )
+            self._evict()
+
+    def invalidate(self, owner: str):
+        # drops everything that may change upstream, i.e. all but the
+        # immutable entries
+        with self._lock, self._db:
+            self._db.execute(
+                "DELETE FROM responses WHERE owner = ? AND expires != ?",
+                (owner, math.inf),
+            )
+
+    def _evict(self):
+        self._db.execute("DELETE FROM responses WHERE expires <= ?", (time.time(),))
+        self._db.execute(
+            "DELETE FROM responses WHERE rowid IN ("
+            " SELECT rowid FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
@@ -1,25 +1,24 @@
 import logging
-import logging.config
 import os
 import sys
 from datetime import date
 
-from . import VoltalisClient
+from .client import VoltalisClient
 
 
 def setup_logging_from_config(config_path):
     if os.path.exists(config_path):
-        logging.config.fileConfig(config_path, disable_existing_loggers=False)
+        from logging.config import fileConfig
+
+        fileConfig(config_path, disable_existing_loggers=False)
     else:
         logging.basicConfig(level=logging.INFO)
     logger = logging.getLogger(__name__)
     return logger
 
 
-setup_logging_from_config("samples/logging.ini")
-
-
 def main(username, password):
+    setup_logging_from_config("samples/logging.ini")
     cli = VoltalisClient(username, password)
     cli.login()
     me = cli.me()
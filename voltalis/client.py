@@ -0,0 +1,267 @@
+import logging
+import os
+import time
+from datetime import date
+
+import requests
+
+from . import metrics, ratelimit
+from .jsonlib import dumpb, response_json
+from .memo import SingleFlight
+from .session import DEFAULT_TIMEOUT, create_session
+from .tokens import Relogin, expires_at
+
+API_URL = os.environ.get("VOLTALIS_API_URL", "https://api.myvoltalis.com")
+# GET endpoints that change server state: never cached
+MUTATING_PATHS = ("programming/reset",)
+
+
+def is_mutation(method: str, path: str) -> bool:
+    return method != "GET" or path.split("?")[0].endswith(MUTATING_PATHS)
+
+
+def call(path, method=None, json=None, headers=None, session=None, timeout=None):
+    method = method or ("POST" if json else "GET")
+    headers = headers or {}
+    headers["Content-Type"] = "application/json"
+    url = f"{API_URL}/{path}"
+    with ratelimit.slot(url) as done:
+        response = metrics.request(
+            "api",
+            session or requests,
+            method,
+            url,
+            data=dumpb(json) if json is not None else None,
+            headers=headers,
+            timeout=timeout or DEFAULT_TIMEOUT,
+        )
+        done(response)
+    return response
+
+
+class VoltalisClient(object):
+    def __init__(
+        self,
+        username,
+        password,
+        log_response_callback=None,
+        session=None,
+        timeout=DEFAULT_TIMEOUT,
+        cache=None,
+        token_store=None,
+        token_max_age=None,
+        **session_options,
+    ) -> None:
+        self.username = username
+        self.password = password
+        self.common_cookies = {}
+        self.login_response = None
+        self.token = None
+        self.log_response_callback = log_response_callback
+        # session_options are forwarded to create_session (pool_maxsize, max_retries, ..)
+        self.session = session or create_session(**session_options)
+        self.timeout = timeout
+        # an optional voltalis.cache.ResponseCache
+        self.cache = cache
+        self.token_store = token_store
+        self.token_max_age = token_max_age
+        self.token_expires_at = None
+        self._in_flight = SingleFlight()
+        self._login_again = Relogin(self)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _call(self, path, method=None, json=None, authenticated=True, fresh=False):
+        # fresh: skips the response cache, the response still refreshes it
+        method = method or ("POST" if json else "GET")
+        if not is_mutation(method, path):
+            return self._in_flight.do(
+                (path, authenticated, fresh),
+                self._request,
+                path,
+                method,
+                json,
+                authenticated,
+                fresh,
+            )
+        return self._request(path, method, json, authenticated)
+
+    def _request(self, path, method, json, authenticated, fresh=False):
+        ttl = self.cache.ttl_for(method, path) if self.cache else None
+        if ttl and not fresh:
+            response = self.cache.get(self.username, path)
+            if response is not None:
+                if metrics.enabled():
+                    record = metrics.RequestMetrics(
+                        "api", method, metrics.endpoint(path)
+                    )
+                    record.observe(response)
+                    metrics.emit(record)
+                return response
+
+        token = self.token
+        if authenticated and self._token_expiring():
+            self._login_again(token)
+            token = self.token
+        response = self._send(path, method, json, authenticated)
+        if authenticated and response.status_code == 401:
+            logging.info(f"{path} -> 401, logging in again")
+            self._login_again(token)
+            response = self._send(path, method, json, authenticated)
+
+        if ttl:
+            self.cache.set(self.username, path, response, ttl)
+        elif self.cache and is_mutation(method, path):
+            self.cache.invalidate(self.username)
+        return response
+
+    def _send(self, path, method, json, authenticated):
+        headers = {}
+        if authenticated:
+            headers["Authorization"] = f"Bearer {self.token}"
+        return call(
+            path,
+            method=method,
+            json=json,
+            headers=headers,
+            session=self.session,
+            timeout=self.timeout,
+        )
+
+    @property
+    def _token_key(self):
+        return f"api:{self.username}"
+
+    def _token_expiring(self):
+        # refresh a minute ahead of the expiry
+        return self.token_expires_at and self.token_expires_at - 60 < time.time()
+
+    def _restore_session(self):
+        stored = self.token_store.load(self._token_key)
+        if not stored:
+            return False
+        expiry = expires_at(stored, stored.get("token"), self.token_max_age)
+        if expiry and expiry - 60 < time.time():
+            return False
+        self.token = stored["token"]
+        self.common_cookies = stored.get("cookies", {})
+        self.token_expires_at = expiry
+        logging.info("login -> reused stored session")
+        return True
+
+    def login(self, force=False):
+        if self.token_store and not force and self._restore_session():
+            return
+        data = {
+            "password": self.password,
+            "login": self.username,
+        }
+        self.login_response = self._send("auth/login", "POST", data, False)
+        self.common_cookies = {
+            cookie.name: cookie.value for cookie in self.login_response.cookies
+        }
+        self._log_response("login", self.login_response)
+        self.token = response_json(self.login_response).get("token")
+        session = {"token": self.token, "cookies": self.common_cookies}
+        if self.token_store and self.token:
+            self.token_store.save(self._token_key, session)
+        self.token_expires_at = expires_at(
+            dict(session, obtained_at=time.time()), self.token, self.token_max_age
+        )
+
+    def _log_response(self, uri: str, response: requests.Response):
+        if self.log_response_callback:
+            self.log_response_callback(uri, response)
+        if response.status_code > 299:
+            logging.warning(f"{uri} -> {response.status_code}")
+        else:
+            logging.info(f"{uri} -> {response.status_code}")
+
+    def me(self):
+        response = self._call("api/account/me")
+        self._log_response("me", response)
+        return response_json(response)
+
+    def logout(self):
+        response = self._call("auth/logout", method="DELETE")
+        self._log_response("logout", response)
+        if self.token_store:
+            self.token_store.delete(self._token_key)
+
+    def get_quicksettings(self, site_id: int, fresh=False):
+        response = self._call(f"api/site/{site_id}/quicksettings", fresh=fresh)
+        self._log_response("get_quicksettings", response)
+        return response_json(response)
+
+    def get_quicksetting(self, site_id: int, quicksetting_id: int):
+        response = self._call(f"api/site/{site_id}/quicksettings/{quicksetting_id}")
+        self._log_response("get_quicksetting", response)
+        return response_json(response)
+
+    def put_quicksetting(
+        self, site_id: int, quicksetting_id: int, quicksetting: dict, check=False
+    ):
+        # check: raise requests.HTTPError on an error status instead of
+        # returning the error body
+        response = self._call(
+            f"api/site/{site_id}/quicksettings/{quicksetting_id}",
+            method="PUT",
+            json=quicksetting,
+        )
+        self._log_response("put_quicksetting", response)
+        if check:
+            response.raise_for_status()
+        return response_json(response)
+
+    def enable_quicksetting(self, site_id: int, quicksetting_id: int):
+        json = {"enabled": True}
+        response = self._call(
+            f"api/site/{site_id}/quicksettings/{quicksetting_id}/enable",
+            method="PUT",
+            json=json,
+        )
+        self._log_response("enable_quicksetting", response)
+        return response_json(response)
+
+    def apply_quicksettings(self, desired: dict, max_workers=8):
+        # {site_id: {quicksetting_id: fields}} -> [QuicksettingResult]
+        from .quicksettings import apply_quicksettings
+
+        return apply_quicksettings(self, desired, max_workers)
+
+    def get_managed_appliances(self, site_id: int):
+        response = self._call(f"api/site/{site_id}/managed-appliance")
+        self._log_response("get_managed_appliances", response)
+        return response_json(response)
+
+    def reset(self, site_id: int):
+        response = self._call(f"api/site/{site_id}/programming/reset")
+        self._log_response("reset", response)
+
+    def sites(self):
+        # the default site first, then the other ones
+        me = self.me()
+        sites = [me.get("defaultSite")] + me.get("otherSites", [])
+        return [site for site in sites if site]
+
+    def site_ids(self):
+        return [site["id"] for site in self.sites()]
+
+    def consumption_stats_per_hour(self, site_id: int, date: date, check=False):
+        # check: as for put_quicksetting
+        date_formatted = date.strftime("%Y-%m-%d")
+
+        response = self._call(
+            f"api/site/{site_id}/consumption/week/{date_formatted}?aggregationType=BY_HOUR",
+        )
+        self._log_response(f"consumption_stats_per_hour-{date_formatted}", response)
+        if check:
+            response.raise_for_status()
+        return response_json(response)
@@ -0,0 +1,243 @@
+import csv
+import math
+from array import array
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from itertools import islice
+from typing import Iterable, Iterator, NamedTuple
+
+WEEK = timedelta(days=7)
+
+
+class ConsumptionStep(NamedTuple):
+    timestamp: int  # epoch seconds, UTC
+    wh: float
+
+    @property
+    def time(self) -> datetime:
+        return datetime.fromtimestamp(self.timestamp, tz=timezone.utc)
+
+    @staticmethod
+    def from_dict(cons: dict) -> "ConsumptionStep":
+        return ConsumptionStep(
+            int(parse_timestamp(cons["stepTimestampInUtc"]).timestamp()),
+            cons["totalConsumptionInWh"],
+        )
+
+
+class ConsumptionSeries(object):
+    # columnar steps: int64 epoch seconds and float32 Wh, 12 bytes per step
+    __slots__ = ("timestamps", "wh")
+
+    def __init__(self, steps: Iterable[ConsumptionStep] = ()) -> None:
+        self.timestamps = array("q")
+        self.wh = array("f")
+        self.extend(steps)
+
+    @staticmethod
+    def from_consumptions(consumptions) -> "ConsumptionSeries":
+        # raw "consumptions" dicts, as returned by the API
+        return ConsumptionSeries(
+            ConsumptionStep.from_dict(cons) for cons in consumptions
+        )
+
+    def append(self, step: ConsumptionStep):
+        # raises BufferError while a to_numpy() view, or a DataFrame built on
+        # it, is alive: the arrays cannot move under them
+        self.timestamps.append(step.timestamp)
+        try:
+            self.wh.append(math.nan if step.wh is None else step.wh)
+        except BufferError:
+            self.timestamps.pop()
+            raise
+
+    def extend(self, steps: Iterable[ConsumptionStep]):
+        for step in steps:
+            self.append(step)
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def __getitem__(self, index):
+        # a step, or a ConsumptionSeries for a slice
+        if isinstance(index, slice):
+            series = ConsumptionSeries()
+            series.timestamps = self.timestamps[index]
+            series.wh = self.wh[index]
+            return series
+        return ConsumptionStep(self.timestamps[index], self.wh[index])
+
+    def __iter__(self) -> Iterator[ConsumptionStep]:
+        return map(ConsumptionStep, self.timestamps, self.wh)
+
+    @property
+    def total_wh(self) -> float:
+        return sum(wh for wh in self.wh if not math.isnan(wh))
+
+    def to_numpy(self):
+        # views on the arrays' buffers, no copy
+        import numpy as np
+
+        return (
+            np.frombuffer(self.timestamps, dtype=np.int64),
+            np.frombuffer(self.wh, dtype=np.float32),
+        )
+
+    def to_dataframe(self):
+        import pandas as pd
+
+        timestamps, wh = self.to_numpy()
+        index = pd.DatetimeIndex(timestamps.view("datetime64[s]"), name="time")
+        return pd.DataFrame({"watts": wh}, index=index.tz_localize("UTC"), copy=False)
+
+
+def parse_timestamp(value: str) -> datetime:
+    # stepTimestampInUtc looks like 2022-12-31T23:00:00Z
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    timestamp = datetime.fromisoformat(value)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp
+
+
+def as_utc(moment) -> datetime:
+    if not isinstance(moment, datetime):
+        moment = datetime(moment.year, moment.month, moment.day)
+    if moment.tzinfo is None:
+        return moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc)
+
+
+def plan_week_windows(start, end):
+    # consumption/week/{date} returns a week of hourly steps: one call every
+    # 7 days covers [start, end). The weeks start on UTC days
+    if isinstance(start, datetime):
+        start = as_utc(start)
+    if isinstance(end, datetime):
+        end = as_utc(end)
+    day = start.date() if isinstance(start, datetime) else start
+    last = end.date() if isinstance(end, datetime) else end
+    if isinstance(end, datetime) and end.time() != datetime.min.time():
+        last += timedelta(days=1)
+    windows = []
+    while day < last:
+        windows.append(day)
+        day += WEEK
+    return windows
+
+
+def _iter_windows(cli, site_id: int, windows, max_workers):
+    # yields the weeks in order, with at most max_workers requests ahead of
+    # the consumer. An error status raises requests.HTTPError: an empty week
+    # would be taken for a week without consumption
+    def fetch(day: date):
+        return cli.consumption_stats_per_hour(site_id, day, check=True)
+
+    windows = iter(windows)
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        pending = deque(
+            executor.submit(fetch, day) for day in islice(windows, max_workers)
+        )
+        while pending:
+            data = pending.popleft().result()
+            for day in islice(windows, 1):
+                pending.append(executor.submit(fetch, day))
+            yield data
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _fetch_windows(cli, site_id: int, intervals, max_workers):
+    # yields (day, steps) for each week window, keeping the steps inside the
+    # intervals that no earlier window returned
+    windows = sorted(
+        {day for start, end in intervals for day in plan_week_windows(start, end)}
+    )
+    bounds = [(as_utc(start), as_utc(end)) for start, end in intervals]
+
+    seen = set()
+    for day, data in zip(windows, _iter_windows(cli, site_id, windows, max_workers)):
+        consumptions = []
+        for cons in data["consumptions"]:
+            step = cons["stepTimestampInUtc"]
+            if step in seen:
+                continue
+            timestamp = parse_timestamp(step)
+            if not any(lower <= timestamp < upper for lower, upper in bounds):
+                continue
+            seen.add(step)
+            consumptions.append(cons)
+        yield day, consumptions
+
+
+def _covered(intervals, days):
+    # the parts of the intervals within the given week windows
+    covered = []
+    for day in days:
+        window_start = as_utc(day)
+        window_end = window_start + WEEK
+        for start, end in intervals:
+            lower = max(as_utc(start), window_start)
+            upper = min(as_utc(end), window_end)
+            if lower < upper:
+                covered.append((lower, upper))
+    return covered
+
+
+def fetch_consumptions(cli, site_id: int, start, end, max_workers=4, store=None):
+    if store is None:
+        consumptions = [
+            cons
+            for _, window in _fetch_windows(cli, site_id, [(start, end)], max_workers)
+            for cons in window
+        ]
+    else:
+        # only the intervals the store has not seen yet go to the API
+        missing = store.missing_intervals(site_id, start, end)
+        days, fetched = [], []
+        try:
+            for day, window in _fetch_windows(cli, site_id, missing, max_workers):
+                days.append(day)
+                fetched.extend(window)
+        finally:
+            # a failed window stays missing, to be fetched again next time
+            if days:
+                store.save(site_id, _covered(missing, days), fetched)
+        consumptions = store.load(site_id, start, end)
+
+    # a step without a value (None) counts for nothing in the total
+    wh = (cons["totalConsumptionInWh"] for cons in consumptions)
+    return {
+        "totalConsumption": sum(value for value in wh if value is not None),
+        "consumptions": consumptions,
+    }
+
+
+def iter_consumption(
+    cli, site_id: int, start, end, max_workers=4
+) -> Iterator[ConsumptionStep]:
+    # constant memory: only the current and the previous week are kept, to
+    # drop the steps returned twice by overlapping windows
+    lower, upper = as_utc(start).timestamp(), as_utc(end).timestamp()
+    previous, current = set(), set()
+    windows = plan_week_windows(start, end)
+    for data in _iter_windows(cli, site_id, windows, max_workers):
+        previous, current = current, set()
+        for cons in data["consumptions"]:
+            step = ConsumptionStep.from_dict(cons)
+            if step.timestamp in previous or step.timestamp in current:
+                continue
+            if not lower <= step.timestamp < upper:
+                continue
+            current.add(step.timestamp)
+            yield step
+
+
+def write_csv(steps: Iterable[ConsumptionStep], fp):
+    writer = csv.writer(fp)
+    writer.writerow(["time", "wh"])
+    for step in steps:
+        writer.writerow([step.time.isoformat(), step.wh])
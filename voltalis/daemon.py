@@ -0,0 +1,270 @@
+import heapq
+import itertools
+import json
+import logging
+import random
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timezone
+
+from . import metrics
+from .client import VoltalisClient
+from .jsonlib import response_json
+from .legacy import VoltalisClient as LegacyVoltalisClient
+from .legacy.dumps import NullDumpSink
+from .tokens import TokenStore
+
+# endpoint name -> (client, site_id) -> payload
+POLLERS = {
+    "quicksettings": lambda cli, site_id: cli.get_quicksettings(site_id),
+    "managed_appliances": lambda cli, site_id: cli.get_managed_appliances(site_id),
+    "consumption": lambda cli, site_id: cli.consumption_stats_per_hour(
+        site_id, date.today(), check=True
+    ),
+}
+
+
+def _legacy_poller(name):
+    def poll(cli, site_id):
+        response = getattr(cli, name)(site_id)
+        response.raise_for_status()
+        return response_json(response)
+
+    return poll
+
+
+LEGACY_POLLERS = {
+    name: _legacy_poller(name)
+    for name in (
+        "lastMinuteConsumption",
+        "immediateConsumptionInkW",
+        "absenceModeState",
+        "modeList",
+        "schedulerList",
+    )
+}
+DEFAULT_INTERVALS = {
+    "quicksettings": 300,
+    "managed_appliances": 900,
+    "consumption": 3600,
+    "lastMinuteConsumption": 60,
+    "immediateConsumptionInkW": 60,
+}
+
+
+class JsonLinesSink(object):
+    def __init__(self, path="-") -> None:
+        self._lock = threading.Lock()
+        self._fp = sys.stdout if path == "-" else open(path, "a")
+
+    def __call__(self, record: dict):
+        line = json.dumps(record, default=str)
+        with self._lock:
+            self._fp.write(line + "\n")
+            self._fp.flush()
+
+    def close(self):
+        if self._fp is not sys.stdout:
+            self._fp.close()
+
+
+class Account(object):
+    def __init__(
+        self, config: dict, token_store=None, base_backoff=30, max_backoff=3600
+    ) -> None:
+        self.username = config["username"]
+        self.legacy = config.get("legacy", False)
+        self.site_ids = config.get("sites")
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.failures = 0
+        self.blocked_until = 0
+        self._lock = threading.Lock()
+        if self.legacy:
+            self.cli = LegacyVoltalisClient(
+                self.username,
+                config["password"],
+                dump_sink=NullDumpSink(),
+                token_store=token_store,
+            )
+        else:
+            self.cli = VoltalisClient(
+                self.username, config["password"], token_store=token_store
+            )
+
+    def ensure_login(self):
+        # a failed site discovery is tried again by the next job
+        with self._lock:
+            if not self.cli.token:
+                self.cli.login()
+            if self.site_ids is None:
+                self.site_ids = self._discover_sites()
+
+    def _discover_sites(self):
+        if self.legacy:
+            return [site.uid for site in self.cli.sites()]
+        return self.cli.site_ids()
+
+    def close(self):
+        self.cli.close()
+
+    def succeeded(self):
+        self.failures = 0
+        self.blocked_until = 0
+
+    def failed(self):
+        # exponential backoff, shared by all the jobs of the account
+        self.failures += 1
+        delay = min(self.max_backoff, self.base_backoff * 2 ** (self.failures - 1))
+        self.blocked_until = time.monotonic() + delay * random.uniform(0.5, 1)
+        return delay
+
+
+class Job(object):
+    def __init__(self, account: Account, endpoint: str, interval: float) -> None:
+        self.account = account
+        self.endpoint = endpoint
+        self.interval = interval
+
+
+class Daemon(object):
+    def __init__(
+        self,
+        accounts,
+        intervals=None,
+        sink=None,
+        max_concurrency=16,
+        jitter=0.1,
+    ) -> None:
+        self.accounts = accounts
+        self.intervals = dict(DEFAULT_INTERVALS, **(intervals or {}))
+        self.sink = sink or JsonLinesSink()
+        self.max_concurrency = max_concurrency
+        self.jitter = jitter
+        self._stopped = threading.Event()
+        self._queue = []
+        self._queue_lock = threading.Lock()
+        self._sequence = itertools.count()
+
+    @classmethod
+    def from_config(cls, config: dict):
+        token_store = config.get("token_store")
+        token_store = TokenStore(token_store) if token_store else None
+        backoff = config.get("backoff", {})
+        accounts = [
+            Account(
+                account,
+                token_store,
+                base_backoff=backoff.get("base", 30),
+                max_backoff=backoff.get("max", 3600),
+            )
+            for account in config["accounts"]
+        ]
+        return cls(
+            accounts,
+            intervals=config.get("intervals"),
+            sink=JsonLinesSink(config.get("output", "-")),
+            max_concurrency=config.get("max_concurrency", 16),
+            jitter=config.get("jitter", 0.1),
+        )
+
+    def _jittered(self, delay):
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def _schedule(self, job: Job, due: float):
+        with self._queue_lock:
+            heapq.heappush(self._queue, (due, next(self._sequence), job))
+
+    def _jobs(self):
+        for account in self.accounts:
+            pollers = LEGACY_POLLERS if account.legacy else POLLERS
+            for endpoint, interval in self.intervals.items():
+                if endpoint in pollers and interval:
+                    yield Job(account, endpoint, interval)
+
+    def _run_job(self, job: Job):
+        account = job.account
+        try:
+            account.ensure_login()
+            pollers = LEGACY_POLLERS if account.legacy else POLLERS
+            for site_id in account.site_ids:
+                started = time.perf_counter()
+                payload = pollers[job.endpoint](account.cli, site_id)
+                self.sink(
+                    {
+                        "time": datetime.now(timezone.utc).isoformat(),
+                        "account": account.username,
+                        "site_id": site_id,
+                        "endpoint": job.endpoint,
+                        "elapsed": time.perf_counter() - started,
+                        "payload": payload,
+                    }
+                )
+            account.succeeded()
+            due = time.monotonic() + self._jittered(job.interval)
+        except Exception as e:
+            delay = account.failed()
+            logging.warning(
+                f"{account.username} {job.endpoint}: {e!r}, backing off {delay}s"
+            )
+            due = account.blocked_until
+        self._schedule(job, due)
+
+    def run(self):
+        now = time.monotonic()
+        for job in self._jobs():
+            # spread the first polls over the interval, not to start in a burst
+            self._schedule(job, now + random.uniform(0, job.interval))
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+                self._loop(executor)
+        finally:
+            for account in self.accounts:
+                account.close()
+            if hasattr(self.sink, "close"):
+                self.sink.close()
+
+    def _loop(self, executor):
+        while not self._stopped.is_set():
+            with self._queue_lock:
+                due, _, job = self._queue[0] if self._queue else (None, 0, None)
+                if job and due <= time.monotonic():
+                    heapq.heappop(self._queue)
+                else:
+                    job = None
+            if job is None:
+                wait = 1 if due is None else due - time.monotonic()
+                self._stopped.wait(max(0, min(wait, 1)))
+                continue
+            if job.account.blocked_until > time.monotonic():
+                due = job.account.blocked_until
+                self._schedule(job, due + random.uniform(0, self.jitter * 60))
+                continue
+            executor.submit(self._run_job, job)
+
+    def stop(self):
+        self._stopped.set()
+
+
+def main(config_path):
+    with open(config_path) as fd:
+        config = json.load(fd)
+    logging.basicConfig(level=config.get("log_level", "INFO"), stream=sys.stderr)
+    if config.get("metrics_port"):
+        exporter = metrics.PrometheusExporter()
+        metrics.add_hook(exporter)
+        exporter.serve(config["metrics_port"])
+    daemon = Daemon.from_config(config)
+    signal.signal(signal.SIGTERM, lambda *_: daemon.stop())
+    try:
+        daemon.run()
+    except KeyboardInterrupt:
+        daemon.stop()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1])
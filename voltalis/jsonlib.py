@@ -0,0 +1,45 @@
+import json
+import time
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+from . import metrics
+
+
+def loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj) -> str:
+    # compact, non-ASCII characters left as is
+    if orjson is not None:
+        return orjson.dumps(obj).decode("utf-8")
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
+
+def dumpb(obj) -> bytes:
+    # dumps() as UTF-8 bytes, for request bodies: orjson's output as is, and a
+    # str body would be encoded as latin-1 by http.client
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return dumps(obj).encode("utf-8")
+
+
+def response_json(response):
+    # parses a requests.Response once, later calls return the same object
+    try:
+        return response._voltalis_json
+    except AttributeError:
+        if not metrics.enabled():
+            response._voltalis_json = loads(response.content)
+            return response._voltalis_json
+        started = time.perf_counter()
+        response._voltalis_json = loads(response.content)
+        duration = time.perf_counter() - started
+        metrics.emit(metrics.ParseMetrics(len(response.content), duration))
+        return response._voltalis_json
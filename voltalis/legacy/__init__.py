@@ -1,21 +1,101 @@
 import logging
-from typing import Callable
-
-import requests
-
-from .voltalis_types import (CurrentProgrammationModeElement, Modulator,
-                             ProgrammationMode, Scheduler, Site, Token)
+import os
+import time
+from typing import TYPE_CHECKING, Callable
+
+from .. import jsonlib, metrics, ratelimit
+from ..jsonlib import response_json
+from ..memo import SingleFlight, TTLCache
+from ..session import DEFAULT_TIMEOUT, create_session
+from ..tokens import Relogin
+from .dumps import DumpSink, default_dump_sink
+from .voltalis_types import (
+    CurrentProgrammationModeElement,
+    Modulator,
+    ProgrammationMode,
+    Scheduler,
+    Site,
+    Token,
+)
+
+if TYPE_CHECKING:
+    from .snapshot import SiteSnapshot
+    from .stream import ConsumptionStream
+
+BASE_URL = os.environ.get("VOLTALIS_LEGACY_URL", "https://myvoltalis.com")
+CLASSIC_URL = os.environ.get("VOLTALIS_CLASSIC_URL", "https://classic.myvoltalis.com")
 
 
 class VoltalisClient(object):
-    def __init__(self, username, password) -> None:
+    def __init__(
+        self,
+        username,
+        password,
+        dump_sink: DumpSink = None,
+        session=None,
+        timeout=DEFAULT_TIMEOUT,
+        token_store=None,
+        token_max_age=None,
+        **session_options,
+    ) -> None:
         self.username = username
         self.password = password
         self.common_cookies = {}
         self.login_response = None
+        self.login_document = None
+        self._sites_by_uid = None
         self.token = None
+        self.token_store = token_store
+        self.token_max_age = token_max_age
+        self.token_obtained_at = None
+        # by default the responses go to ./dumps when that directory exists
+        self.dump_sink = dump_sink or default_dump_sink()
+        self.session = session or create_session(**session_options)
+        self.timeout = timeout
+        self._streams = {}
+        self._in_flight = SingleFlight()
+        self._login_again = Relogin(self)
+
+    def close(self):
+        # writes the pending dumps
+        self.dump_sink.close()
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def _token_key(self):
+        return f"legacy:{self.username}"
+
+    def _token_expiring(self):
+        return (
+            self.token_max_age is not None
+            and self.token_obtained_at is not None
+            and self.token_obtained_at + self.token_max_age < time.time()
+        )
+
+    def _restore_session(self):
+        stored = self.token_store.load(self._token_key)
+        if not stored:
+            return False
+        self.token_obtained_at = stored.get("obtained_at", 0)
+        if self._token_expiring():
+            return False
+        self.login_document = stored["document"]
+        self._sites_by_uid = None
+        self.common_cookies = stored.get("cookies", {})
+        self.token = Token(self.login_document)
+        logging.info("login -> reused stored session")
+        return True
+
+    def login(self, force=False):
+        if self.token_store and not force and self._restore_session():
+            return
 
-    def login(self):
         data = {
             "id": "",
             "alternative_email": "",
@@ -31,27 +111,67 @@ class VoltalisClient(object):
             "stayLoggedIn": "true",
         }
 
-        self.login_response = requests.post("https://classic.myvoltalis.com/login", data=data)
+        self.login_response = self.session.post(
+            f"{CLASSIC_URL}/login", data=data, timeout=self.timeout
+        )
         self.common_cookies = {
             cookie.name: cookie.value for cookie in self.login_response.cookies
         }
         self._log_response("/login.json", self.login_response)
-        self.token = Token(self.login_response.json())
+        self.login_document = response_json(self.login_response)
+        self._sites_by_uid = None
+        self.token = Token(self.login_document)
+        self.token_obtained_at = time.time()
+        if self.token_store and self.token.value:
+            self.token_store.save(
+                self._token_key,
+                {"document": self.login_document, "cookies": self.common_cookies},
+            )
 
     def sites(self):
-        site_list = self.login_response.json().get("subscriber", {}).get("siteList", [])
-        return [Site(site) for site in site_list]
+        return list(self._site_index().values())
 
-    @staticmethod
-    def _log_response(uri, response):
+    def site(self, site_id) -> Site:
+        return self._site_index()[site_id]
+
+    def _site_index(self):
+        # parsed once per login
+        if self._sites_by_uid is None:
+            subscriber = self.login_document.get("subscriber", {})
+            sites = [Site(site) for site in subscriber.get("siteList", [])]
+            self._sites_by_uid = {site.uid: site for site in sites}
+        return self._sites_by_uid
+
+    def _log_response(self, uri, response):
         called = uri.split("/")[-1].split(".json")[0]
 
         if response.status_code != 204:
-            with open(f"dumps/response-{called}.bin", "wb") as fd:
-                fd.write(response.content)
+            if self.dump_sink.accepts(called, response.content):
+                self.dump_sink.write(called, response.content)
             logging.info(f"{called} -> {response.status_code}")
 
     def _call(self, uri, site_id, data=None):
+        if not data:
+            return self._in_flight.do((uri, site_id), self._request, uri, site_id)
+        return self._request(uri, site_id, data)
+
+    def _request(self, uri, site_id, data=None):
+        token = self.token
+        if self._token_expiring():
+            self._login_again(token)
+            token = self.token
+
+        response = self._send(uri, site_id, data)
+        if response.status_code == 401:
+            logging.info(f"{uri} -> 401, logging in again")
+            self._login_again(token)
+            response = self._send(uri, site_id, data)
+
+        self._log_response(uri, response)
+
+        return response
+
+    def _send(self, uri, site_id, data=None):
         headers = {
             "User-Site-Id": str(site_id),
             "Accept": "application/json, text/plain, */*",
@@ -63,76 +183,100 @@ class VoltalisClient(object):
         cookies = self.token.as_cookie()
         cookies.update(self.common_cookies)
 
-        method = requests.post if data else requests.get
-
-        response = method(
-            uri,
-            cookies=cookies,
-            headers=headers,
-            json=data,
-        )
-
-        self._log_response(uri, response)
-
+        with ratelimit.slot(uri) as done:
+            response = metrics.request(
+                "legacy",
+                self.session,
+                "POST" if data else "GET",
+                uri,
+                cookies=cookies,
+                headers=headers,
+                data=jsonlib.dumpb(data) if data else None,
+                timeout=self.timeout,
+            )
+            done(response)
         return response
 
     def lastMinuteConsumption(self, site_id):
-        uri = "https://myvoltalis.com/siteDataRealTime/lastMinuteConsumption.json"
+        uri = f"{BASE_URL}/siteDataRealTime/lastMinuteConsumption.json"
         return self._call(uri, site_id)
 
     def immediateConsumptionInkW(self, site_id):
-        uri = "https://myvoltalis.com/siteData/immediateConsumptionInkW.json"
+        uri = f"{BASE_URL}/siteData/immediateConsumptionInkW.json"
         return self._call(uri, site_id)
 
     def siteMaxPower(self, site_id):
         # FIXME serialize dates
-        uri = "https://myvoltalis.com/siteData/getSiteMaxPower.json?endDate=1648763999999&startDate=1617228000000"
+        uri = f"{BASE_URL}/siteData/getSiteMaxPower.json?endDate=1648763999999&startDate=1617228000000"
         return self._call(uri, site_id)
 
     def absenceModeState(self, site_id):
-        uri = "https://myvoltalis.com/programmationEvent/getAbsenceModeState.json"
+        uri = f"{BASE_URL}/programmationEvent/getAbsenceModeState.json"
         return self._call(uri, site_id)
 
     def absenceState(self, site_id, modulator_id):
-        uri = f"https://myvoltalis.com/absence/getAbsenceState.json?csLinkId={modulator_id}"
+        uri = f"{BASE_URL}/absence/getAbsenceState.json?csLinkId={modulator_id}"
         return self._call(uri, site_id)
 
     def onOffState(self, site_id, modulator_id):
-        uri = f"https://myvoltalis.com/programmationEvent/getOnOffState.json?csLinkId={modulator_id}"
+        uri = (
+            f"{BASE_URL}/programmationEvent/getOnOffState.json?csLinkId={modulator_id}"
+        )
         return self._call(uri, site_id)
 
     def modulatorState(self, site_id, modulator_id):
-        uri = f"https://myvoltalis.com/modulator/getModulatorState.json?csLinkId={modulator_id}"
+        uri = f"{BASE_URL}/modulator/getModulatorState.json?csLinkId={modulator_id}"
         return self._call(uri, site_id)
 
     def availableProgrammationMode(self, site_id):
-        uri = "https://myvoltalis.com/scheduler/availableProgrammationMode.json"
+        uri = f"{BASE_URL}/scheduler/availableProgrammationMode.json"
         return self._call(uri, site_id)
 
     def modeList(self, site_id):
-        uri = "https://myvoltalis.com/scheduler/getModeList.json"
+        uri = f"{BASE_URL}/scheduler/getModeList.json"
         return self._call(uri, site_id)
 
     def schedulerList(self, site_id):
-        uri = "https://myvoltalis.com/scheduler/getSchedulerList.json"
+        uri = f"{BASE_URL}/scheduler/getSchedulerList.json"
         return self._call(uri, site_id)
 
     def immediateConsumptionCharts(self, site_id):
-        uri = "https://myvoltalis.com/chart/getImmediateConsumptionCharts.json?chartWithLegend=true&endDate=18%2F04%2F2022&isWebView=false&startDate=18%2F04%2F2022&withSubscriptionSerie=true"
+        uri = f"{BASE_URL}/chart/getImmediateConsumptionCharts.json?chartWithLegend=true&endDate=18%2F04%2F2022&isWebView=false&startDate=18%2F04%2F2022&withSubscriptionSerie=true"
         return self._call(uri, site_id)
 
     def annualConsumptionChartsCharts(self, site_id):
-        uri = "https://myvoltalis.com/chart/getAnnualConsumptionDetailedCharts.json?isWebView=false"
+        uri = (
+            f"{BASE_URL}/chart/getAnnualConsumptionDetailedCharts.json?isWebView=false"
+        )
         return self._call(uri, site_id)
 
     def totalModulatedPower(self, site_id):
-        uri = "https://myvoltalis.com/siteData/getTotalModulatedPower.json?endDate=1648763999999&startDate=1617228000000"
+        uri = f"{BASE_URL}/siteData/getTotalModulatedPower.json?endDate=1648763999999&startDate=1617228000000"
         return self._call(uri, site_id)
 
     def countryConsumptionMap(self, site_id):
-        uri = "https://myvoltalis.com/chart/getCountryConsumptionMap.json?isWebView=false&mapType=annual&useLegend=true"
+        uri = f"{BASE_URL}/chart/getCountryConsumptionMap.json?isWebView=false&mapType=annual&useLegend=true"
         return self._call(uri, site_id)
 
+    def snapshot(self, site_id, max_workers=8) -> "SiteSnapshot":
+        from .snapshot import take_snapshot
+
+        modulators = self.site(site_id).modulators
+        return take_snapshot(
+            self, site_id, [modulator.uid for modulator in modulators], max_workers
+        )
+
+    def stream(self, site_id, intervals=None) -> "ConsumptionStream":
+        # one real-time stream per site, shared by every caller of this client
+        from .stream import ConsumptionStream
+
+        stream = self._streams.get(site_id)
+        if stream is None:
+            stream = self._streams.setdefault(
+                site_id, ConsumptionStream(self, site_id, intervals)
+            )
+        return stream
+
     @staticmethod
     def _prepare_modulator_payload(modulator: Modulator, turn_on_function: Callable):
         if not turn_on_function:
@@ -149,84 +293,138 @@ class VoltalisClient(object):
 
     def _prepare_update_on_off_payload(self, site_id, turn_on_function: Callable):
         modulators_payload = []
-        for modulator in {site.uid: site for site in self.sites()}[site_id].modulators:
+        for modulator in self.site(site_id).modulators:
             modulators_payload.append(
                 self._prepare_modulator_payload(modulator, turn_on_function)
             )
         return {"csLinkList": modulators_payload}
 
     def updateOnOff(self, site_id, data=None, turn_on_function=None):
-        uri = "https://myvoltalis.com/programmationEvent/updateOnOffEvent"
+        uri = f"{BASE_URL}/programmationEvent/updateOnOffEvent"
 
         if not data:
             data = self._prepare_update_on_off_payload(site_id, turn_on_function)
 
         return self._call(uri, site_id, data)
 
+    def switch_all(
+        self, turn_on_function: Callable = None, max_workers=8, site_ids=None
+    ):
+        from .switch import switch_all
+
+        return switch_all(self, turn_on_function, max_workers, site_ids)
+
     def updateModeConfig(self, site_id, data):
-        uri = "https://myvoltalis.com/scheduler/updateModeConfig"
+        uri = f"{BASE_URL}/scheduler/updateModeConfig"
         return self._call(uri, site_id, data)
 
     def updateSchedulerConfig(self, site_id, data):
-        uri = "https://myvoltalis.com/scheduler/updateSchedulerConfig"
+        uri = f"{BASE_URL}/scheduler/updateSchedulerConfig"
         return self._call(uri, site_id, data)
 
     def changeSchedulerState(self, site_id, data):
-        uri = "https://myvoltalis.com/scheduler/changeSchedulerState"
+        uri = f"{BASE_URL}/scheduler/changeSchedulerState"
         return self._call(uri, site_id, data)
 
 
 class ReasonedVoltalisClient(object):
-    def __init__(self, cli: VoltalisClient) -> None:
+    def __init__(self, cli: VoltalisClient, max_entries=256, ttl=300) -> None:
         self.cli = cli
 
-        if not getattr(self.cli, "login_response"):
+        if not self.cli.token:
             self.cli.login()
 
-        self._cache = {}
+        # parsed payloads, not Responses; errors are raised, never cached
+        self._cache = TTLCache(max_entries=max_entries, ttl=ttl)
 
     def key(self, method: Callable, args):
-        return "$".join([method.__name__] + [repr(arg) for arg in args])
+        return (method.__name__,) + tuple(args)
+
+    @staticmethod
+    def _fetch(method: Callable, *args):
+        response = method(*args)
+        response.raise_for_status()
+        return response_json(response)
 
-    # TODO https://stackoverflow.com/a/24778714
     def memoized(self, method, *args):
-        key = self.key(method, args)
-        response = self._cache.get(key, None)
-        if not response:
-            response = method(*args)
-            self._cache[key] = response
+        return self._cache.get_or_compute(
+            self.key(method, args), self._fetch, method, *args
+        )
+
+    def invalidate(self, site_uid=None):
+        if site_uid is None:
+            self._cache.invalidate()
+        else:
+            self._cache.invalidate(lambda key: key[1:2] == (site_uid,))
+
+    def updateModeConfig(self, site_uid, data):
+        response = self.cli.updateModeConfig(site_uid, data)
+        self.invalidate(site_uid)
         return response
 
-    def get_mode_by_name(self, site_uid, name) -> ProgrammationMode:
-        response = self.memoized(self.cli.modeList, site_uid)
-        modes = response.json().get("programmationModeList", [])
-        matching_mode = None
+    def updateSchedulerConfig(self, site_uid, data):
+        response = self.cli.updateSchedulerConfig(site_uid, data)
+        self.invalidate(site_uid)
+        return response
+
+    def changeSchedulerState(self, site_uid, data):
+        response = self.cli.changeSchedulerState(site_uid, data)
+        self.invalidate(site_uid)
+        return response
+
+    def _indexed(self, name, site_uid, build: Callable):
+        # derived views live in the same cache, so invalidate() drops them too
+        return self._cache.get_or_compute((name, site_uid), build, site_uid)
+
+    def _build_modes_by_name(self, site_uid):
+        modes = self.memoized(self.cli.modeList, site_uid).get(
+            "programmationModeList", []
+        )
+        modes_by_name = {}
         for mode in modes:
             typed_mode = ProgrammationMode.from_dict(mode)
-            if typed_mode.name == name:
-                matching_mode = typed_mode
-                break
-        return matching_mode
-
-    def get_scheduler_by_name(self, site_uid, name) -> ProgrammationMode:
-        response = self.memoized(self.cli.schedulerList, site_uid)
-        schedulers = response.json().get("schedulerList", [])
-        matching_scheduler = None
+            modes_by_name.setdefault(typed_mode.name, typed_mode)
+        return modes_by_name
+
+    def _build_schedulers_by_name(self, site_uid):
+        schedulers = self.memoized(self.cli.schedulerList, site_uid).get(
+            "schedulerList", []
+        )
+        schedulers_by_name = {}
         for scheduler in schedulers:
             typed_scheduler = Scheduler.from_dict(scheduler)
-            if typed_scheduler.name == name:
-                matching_scheduler = typed_scheduler
-                break
-        return matching_scheduler
+            schedulers_by_name.setdefault(typed_scheduler.name, typed_scheduler)
+        return schedulers_by_name
 
-    def get_available_modulator_modes_for(self, site_uid, modulator_type_id):
-        response = self.memoized(self.cli.availableProgrammationMode, site_uid)
-        available_modes = response.json().get("availableModesByModulatorType")
-        available_modes_for_this_modulator = available_modes.get(
-            str(modulator_type_id), []
+    def _build_modes_by_modulator_type(self, site_uid):
+        available_modes = self.memoized(
+            self.cli.availableProgrammationMode, site_uid
+        ).get("availableModesByModulatorType")
+        return {
+            modulator_type_id: [
+                CurrentProgrammationModeElement.from_dict(mode) for mode in modes
+            ]
+            for modulator_type_id, modes in available_modes.items()
+        }
+
+    def modes_by_name(self, site_uid):
+        return self._indexed("modes_by_name", site_uid, self._build_modes_by_name)
+
+    def schedulers_by_name(self, site_uid):
+        return self._indexed(
+            "schedulers_by_name", site_uid, self._build_schedulers_by_name
         )
-        available_modes_for_this_modulator = [
-            CurrentProgrammationModeElement.from_dict(mode)
-            for mode in available_modes_for_this_modulator
-        ]
-        return available_modes_for_this_modulator
+
+    def modes_by_modulator_type(self, site_uid):
+        return self._indexed(
+            "modes_by_modulator_type", site_uid, self._build_modes_by_modulator_type
+        )
+
+    def get_mode_by_name(self, site_uid, name) -> ProgrammationMode:
+        return self.modes_by_name(site_uid).get(name)
+
+    def get_scheduler_by_name(self, site_uid, name) -> Scheduler:
+        return self.schedulers_by_name(site_uid).get(name)
+
+    def get_available_modulator_modes_for(self, site_uid, modulator_type_id):
+        return self.modes_by_modulator_type(site_uid).get(str(modulator_type_id), [])
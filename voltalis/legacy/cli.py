@@ -1,67 +1,60 @@
 import json
 import logging
-import logging.config
 import os
 import sys
 from datetime import datetime
+from typing import Optional
 
+from ..jsonlib import response_json
 from . import ReasonedVoltalisClient, VoltalisClient
-from .voltalis_types import (Datum, DayOfWeek, Group, Mode, Modulator,
-                             ModulatorState, ProgrammationMode, Scheduler,
-                             TranslationKey)
+from .voltalis_types import (
+    Datum,
+    DayOfWeek,
+    Group,
+    Mode,
+    Modulator,
+    ModulatorState,
+    ProgrammationMode,
+    Scheduler,
+    TranslationKey,
+)
 
 
 def setup_logging_from_config(config_path):
     if os.path.exists(config_path):
-        logging.config.fileConfig(config_path, disable_existing_loggers=False)
+        from logging.config import fileConfig
+
+        fileConfig(config_path, disable_existing_loggers=False)
     else:
         logging.basicConfig(level=logging.INFO)
     logger = logging.getLogger(__name__)
     return logger
 
 
-setup_logging_from_config("samples/logging.ini")
-
-
 def main(username, password):
-    cli = VoltalisClient(username, password)
-    cli.login()
-
-    for site in cli.sites():
-        # en resumé
-        cli.lastMinuteConsumption(site.uid)
-        cli.immediateConsumptionInkW(site.uid)
-        cli.siteMaxPower(site.uid)
-        modulator = site.modulators[-1]
-
-        # on/off
-        cli.onOffState(site.uid, modulator.uid)
-        cli.modulatorState(site.uid, modulator.uid)
-
-        # absence
-        cli.absenceModeState(site.uid)
-        cli.absenceState(site.uid, modulator.uid)
-
-        # mon planning
-        cli.availableProgrammationMode(site.uid)
-        cli.modeList(site.uid)
-        cli.schedulerList(site.uid)
-
-        # en live
-        cli.immediateConsumptionCharts(site.uid)
-
-        # sur l'année
-        cli.annualConsumptionChartsCharts(site.uid)
-        cli.totalModulatedPower(site.uid)
-        cli.countryConsumptionMap(site.uid)
+    setup_logging_from_config("samples/logging.ini")
+    with VoltalisClient(username, password) as cli:
+        cli.login()
+
+        for site in cli.sites():
+            snapshot = cli.snapshot(site.uid)
+            logging.info(f"site {site.uid} snapshot in {snapshot.elapsed:.3f}s")
+            for result in snapshot.results():
+                if not result.ok:
+                    logging.warning(
+                        f"{result.name} ({result.elapsed:.3f}s): {result.error}"
+                    )
 
 
-def common_switch(username, password, turn_on_function):
-    cli = VoltalisClient(username, password)
-    cli.login()
+def common_switch(username, password, turn_on_function, token_store=None):
+    with VoltalisClient(username, password, token_store=token_store) as cli:
+        cli.login()
 
-    for site in cli.sites():
-        cli.updateOnOff(site.uid, turn_on_function=turn_on_function)
+        for result in cli.switch_all(turn_on_function):
+            if result.error:
+                logging.warning(f"{result.site_id} -> {result.error}")
+            else:
+                logging.info(f"{result.site_id} -> {result.status}")
 
 
 def turn_all_on(username, password):
@@ -108,76 +101,86 @@ def find_corresponding_mode(available_modes_for_this_modulator):
     return corresponding_mode
 
 
-def set_all_eco(username, password):
-    cli = VoltalisClient(username, password)
-    rcli = ReasonedVoltalisClient(cli)
-    for site in cli.sites():
-        targets = []
-        for modulator in site.modulators:
-            available_modes_for_this_modulator = rcli.get_available_modulator_modes_for(
-                site.uid, modulator.modulator_type_id
+def _dump_request(name, payload):
+    # kept next to the response dumps, when there is a dumps/ directory
+    if os.path.isdir("dumps"):
+        with open(f"dumps/request-{name}.json", "w") as fd:
+            json.dump(payload, fd)
+
+
+def set_site_eco(rcli: ReasonedVoltalisClient, site) -> Optional[int]:
+    # sets every modulator of the site to eco and activates the AllEco
+    # scheduler, returns its id
+    targets = []
+    for modulator in site.modulators:
+        available_modes_for_this_modulator = rcli.get_available_modulator_modes_for(
+            site.uid, modulator.modulator_type_id
+        )
+        corresponding_mode = find_corresponding_mode(available_modes_for_this_modulator)
+        if corresponding_mode:
+            logging.info(f"✅ {modulator.name}: {corresponding_mode.db_id}")
+            targets.append(
+                create_modulator_state(
+                    modulator,
+                    corresponding_mode,
+                    available_modes_for_this_modulator,
+                )
             )
-            corresponding_mode = find_corresponding_mode(
-                available_modes_for_this_modulator
+        else:
+            logging.warning(
+                f"⚠️ {modulator.name}: {available_modes_for_this_modulator}"
             )
-            if corresponding_mode:
-                logging.info(f"✅ {modulator.name}: {corresponding_mode.db_id}")
-                targets.append(
-                    create_modulator_state(
-                        modulator,
-                        corresponding_mode,
-                        available_modes_for_this_modulator,
-                    )
-                )
-            else:
-                logging.warning(
-                    f"⚠️ {modulator.name}: {available_modes_for_this_modulator}"
-                )
 
-        ALL_ECO_NAME = "AllEco"
+    ALL_ECO_NAME = "AllEco"
+    all_eco_mode = rcli.get_mode_by_name(site.uid, ALL_ECO_NAME)
+
+    if not all_eco_mode:
+        logging.info("creating a new eco mode")
+        group = Group(None, None, None, None, [])
+        all_eco_mode = ProgrammationMode(
+            None, ALL_ECO_NAME, 0, "#f13434", [group], targets
+        )
+        payload = {"programmationMode": all_eco_mode.to_dict()}
+        _dump_request("updateModeConfig", payload)
+
+        rcli.updateModeConfig(site.uid, payload)
         all_eco_mode = rcli.get_mode_by_name(site.uid, ALL_ECO_NAME)
+        assert all_eco_mode
+
+    all_eco_scheduler = rcli.get_scheduler_by_name(site.uid, ALL_ECO_NAME)
+
+    if not all_eco_scheduler:
+        now = datetime.now()
+        time_begin = f"{now.hour:02d}:{now.minute+1:02d}"
+        planning = [DayOfWeek(id_day=x, day_is_on=True) for x in range(1, 8)]
+        scheduler_mode = Mode(
+            all_eco_mode.id,
+            color_mode=all_eco_mode.color,
+            label_mode=all_eco_mode.name,
+        )
+        data = [
+            Datum(time_begin="00:00", time_end=time_begin, mode=scheduler_mode),
+            Datum(time_begin=time_begin, time_end="00:00", mode=scheduler_mode),
+        ]
+        scheduler = Scheduler(None, ALL_ECO_NAME, False, True, data, planning)
+        payload = {"scheduler": scheduler.to_dict()}
+        _dump_request("updateSchedulerConfig", payload)
+        response = rcli.updateSchedulerConfig(site.uid, payload)
+        all_eco_scheduler_id = response_json(response).get("schedulerId")
+    else:
+        all_eco_scheduler_id = all_eco_scheduler.id
+
+    if all_eco_scheduler_id:
+        payload = {"schedulerId": all_eco_scheduler_id, "isActive": True}
+        rcli.changeSchedulerState(site.uid, payload)
+    return all_eco_scheduler_id
 
-        if not all_eco_mode:
-            logging.info("creating a new eco mode")
-            group = Group(None, None, None, None, [])
-            all_eco_mode = ProgrammationMode(
-                None, ALL_ECO_NAME, 0, "#f13434", [group], targets
-            )
-            payload = {"programmationMode": all_eco_mode.to_dict()}
-            with open("dumps/request-updateModeConfig.json", "w") as fd:
-                json.dump(payload, fd)
-
-            cli.updateModeConfig(site.uid, payload)
-            all_eco_mode = rcli.get_mode_by_name(site.uid, ALL_ECO_NAME)
-            assert all_eco_mode
-
-        all_eco_scheduler = rcli.get_scheduler_by_name(site.uid, ALL_ECO_NAME)
-
-        if not all_eco_scheduler:
-            now = datetime.now()
-            time_begin = f"{now.hour:02d}:{now.minute+1:02d}"
-            planning = [DayOfWeek(id_day=x, day_is_on=True) for x in range(1, 8)]
-            scheduler_mode = Mode(
-                all_eco_mode.id,
-                color_mode=all_eco_mode.color,
-                label_mode=all_eco_mode.name,
-            )
-            data = [
-                Datum(time_begin="00:00", time_end=time_begin, mode=scheduler_mode),
-                Datum(time_begin=time_begin, time_end="00:00", mode=scheduler_mode),
-            ]
-            scheduler = Scheduler(None, ALL_ECO_NAME, False, True, data, planning)
-            payload = {"scheduler": scheduler.to_dict()}
-            with open("dumps/request-updateSchedulerConfig.json", "w") as fd:
-                json.dump(payload, fd)
-            response = cli.updateSchedulerConfig(site.uid, payload)
-            all_eco_scheduler_id = response.json().get('schedulerId')
-        else:
-            all_eco_scheduler_id = all_eco_scheduler.id
 
-        if all_eco_scheduler_id:
-            payload = {"schedulerId": all_eco_scheduler_id, "isActive": True}
-            cli.changeSchedulerState(site.uid, payload)
+def set_all_eco(username, password, token_store=None):
+    with VoltalisClient(username, password, token_store=token_store) as cli:
+        rcli = ReasonedVoltalisClient(cli)
+        for site in cli.sites():
+            set_site_eco(rcli, site)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,153 @@
+import atexit
+import gzip
+import hashlib
+import logging
+import os
+import queue
+import random
+import threading
+from collections import deque
+from datetime import datetime
+
+
+class DumpSink(object):
+    def accepts(self, called: str, content: bytes) -> bool:
+        return True
+
+    def write(self, called: str, content: bytes):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class NullDumpSink(DumpSink):
+    def accepts(self, called: str, content: bytes) -> bool:
+        return False
+
+    def write(self, called: str, content: bytes):
+        pass
+
+
+class FileDumpSink(DumpSink):
+    # naming: "name" overwrites dumps/response-{called}.bin, "timestamp" and
+    # "hash" keep one file per response. max_files rotates the files written
+    # by this sink, oldest first.
+    def __init__(
+        self,
+        directory="dumps",
+        naming="name",
+        sample_rate=1.0,
+        max_bytes=None,
+        max_files=None,
+        compress=False,
+    ) -> None:
+        if naming not in ("name", "timestamp", "hash"):
+            raise ValueError(f"unknown naming {naming!r}")
+        self.directory = directory
+        self.naming = naming
+        self.sample_rate = sample_rate
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.compress = compress
+        self._written = deque()
+        # threads sharing the sink must not race on the names and the rotation
+        self._lock = threading.Lock()
+
+    def accepts(self, called: str, content: bytes) -> bool:
+        if self.max_bytes is not None and len(content) > self.max_bytes:
+            return False
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def _filename(self, called: str, content: bytes) -> str:
+        if self.naming == "timestamp":
+            suffix = f"-{datetime.now().strftime('%Y%m%dT%H%M%S%f')}"
+        elif self.naming == "hash":
+            suffix = f"-{hashlib.sha1(content).hexdigest()[:16]}"
+        else:
+            suffix = ""
+        extension = ".bin.gz" if self.compress else ".bin"
+        return os.path.join(self.directory, f"response-{called}{suffix}{extension}")
+
+    def write(self, called: str, content: bytes):
+        opener = gzip.open if self.compress else open
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._filename(called, content)
+            with opener(path, "wb") as fd:
+                fd.write(content)
+            self._rotate(path)
+
+    def _rotate(self, path: str):
+        if path in self._written:
+            self._written.remove(path)
+        self._written.append(path)
+        while self.max_files is not None and len(self._written) > self.max_files:
+            try:
+                os.remove(self._written.popleft())
+            except FileNotFoundError:
+                pass
+
+
+class BackgroundDumpSink(DumpSink):
+    # hands the writes over to a daemon thread; when the queue is full the
+    # dump is dropped rather than blocking the request. The queued dumps are
+    # written at interpreter exit, or on close()
+    def __init__(self, sink: DumpSink, max_queue=1000) -> None:
+        self.sink = sink
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def accepts(self, called: str, content: bytes) -> bool:
+        return self.sink.accepts(called, content)
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="voltalis-dumps", daemon=True
+                )
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self.sink.write(*item)
+            except Exception:
+                logging.exception(f"unable to dump {item[0]}")
+            finally:
+                self._queue.task_done()
+
+    def write(self, called: str, content: bytes):
+        self._start()
+        try:
+            self._queue.put_nowait((called, content))
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self):
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            atexit.unregister(self.close)
+            self._queue.put(None)
+            thread.join()
+        self.sink.close()
+
+
+def default_dump_sink(directory="dumps") -> DumpSink:
+    # as before the sinks: the responses are dumped only when the directory
+    # already exists, nothing is created in the working directory otherwise
+    if os.path.isdir(directory):
+        return BackgroundDumpSink(FileDumpSink(directory))
+    return NullDumpSink()
@@ -0,0 +1,106 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from ..jsonlib import response_json
+
+# read-only endpoints of the legacy client, called by snapshot()
+SITE_ENDPOINTS = (
+    # en resumé
+    "lastMinuteConsumption",
+    "immediateConsumptionInkW",
+    "siteMaxPower",
+    # absence
+    "absenceModeState",
+    # mon planning
+    "availableProgrammationMode",
+    "modeList",
+    "schedulerList",
+    # en live
+    "immediateConsumptionCharts",
+    # sur l'année
+    "annualConsumptionChartsCharts",
+    "totalModulatedPower",
+    "countryConsumptionMap",
+)
+MODULATOR_ENDPOINTS = (
+    "onOffState",
+    "modulatorState",
+    "absenceState",
+)
+
+
+@dataclass
+class CallResult:
+    name: str
+    modulator_id: Optional[int]
+    elapsed: float
+    status_code: Optional[int] = None
+    payload: Any = None
+    error: Optional[Exception] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass
+class SiteSnapshot:
+    site_id: int
+    elapsed: float
+    site: Dict[str, CallResult] = field(default_factory=dict)
+    modulators: Dict[int, Dict[str, CallResult]] = field(default_factory=dict)
+
+    def results(self) -> List[CallResult]:
+        results = list(self.site.values())
+        for modulator_results in self.modulators.values():
+            results.extend(modulator_results.values())
+        return results
+
+    @property
+    def errors(self) -> List[CallResult]:
+        return [result for result in self.results() if not result.ok]
+
+
+def _timed_call(cli, name, site_id, modulator_id=None) -> CallResult:
+    args = (site_id,) if modulator_id is None else (site_id, modulator_id)
+    started = time.perf_counter()
+    result = CallResult(name, modulator_id, 0)
+    try:
+        response = getattr(cli, name)(*args)
+        result.status_code = response.status_code
+        response.raise_for_status()
+        if response.content:
+            result.payload = response_json(response)
+    except Exception as e:
+        result.error = e
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def take_snapshot(cli, site_id, modulator_ids, max_workers=8) -> SiteSnapshot:
+    calls = [(name, None) for name in SITE_ENDPOINTS]
+    calls += [
+        (name, modulator_id)
+        for modulator_id in modulator_ids
+        for name in MODULATOR_ENDPOINTS
+    ]
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(
+            executor.map(
+                lambda call: _timed_call(cli, call[0], site_id, call[1]), calls
+            )
+        )
+
+    snapshot = SiteSnapshot(site_id, time.perf_counter() - started)
+    for result in results:
+        if result.modulator_id is None:
+            snapshot.site[result.name] = result
+        else:
+            snapshot.modulators.setdefault(result.modulator_id, {})[
+                result.name
+            ] = result
+    return snapshot
@@ -0,0 +1,190 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional
+
+from ..jsonlib import dumps, response_json
+
+# seconds between two polls; the backend refreshes these once a minute
+DEFAULT_INTERVALS = {
+    "lastMinuteConsumption": 60,
+    "immediateConsumptionInkW": 60,
+}
+
+
+@dataclass
+class Sample:
+    endpoint: str
+    site_id: int
+    time: datetime
+    payload: Any
+
+    def to_dict(self) -> dict:
+        return {
+            "endpoint": self.endpoint,
+            "site_id": self.site_id,
+            "time": self.time.isoformat(),
+            "payload": self.payload,
+        }
+
+
+class ConsumptionStream(object):
+    # polls the real-time endpoints of one site from a single thread, while
+    # there are subscribers, and hands each new sample over to all of them.
+    # A sample equal to the previous one of the same endpoint is dropped.
+    def __init__(self, cli, site_id, intervals: Optional[Dict[str, float]] = None):
+        self.cli = cli
+        self.site_id = site_id
+        self.intervals = dict(intervals or DEFAULT_INTERVALS)
+        self.latest: Dict[str, Sample] = {}
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._stopped = None
+
+    def subscribe(self, callback: Callable[[Sample], None], replay=True):
+        # replay: starts with the latest sample of each endpoint
+        with self._lock:
+            self._subscribers.append(callback)
+            latest = list(self.latest.values()) if replay else []
+            if self._stopped is None:
+                self._stopped = threading.Event()
+                threading.Thread(
+                    target=self._run, args=(self._stopped,), daemon=True
+                ).start()
+        for sample in latest:
+            callback(sample)
+        return lambda: self.unsubscribe(callback)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+            if not self._subscribers and self._stopped is not None:
+                self._stopped.set()
+                self._stopped = None
+
+    def _run(self, stopped: threading.Event):
+        due = dict.fromkeys(self.intervals, 0)
+        while not stopped.wait(max(0, min(due.values()) - time.monotonic())):
+            for endpoint, at in due.items():
+                if at <= time.monotonic():
+                    self._poll(endpoint)
+                    due[endpoint] = time.monotonic() + self.intervals[endpoint]
+
+    def _poll(self, endpoint):
+        try:
+            response = getattr(self.cli, endpoint)(self.site_id)
+            response.raise_for_status()
+            payload = response_json(response)
+        except Exception as e:
+            logging.warning(f"{endpoint} {self.site_id}: {e!r}")
+            return
+
+        with self._lock:
+            previous = self.latest.get(endpoint)
+            if previous is not None and previous.payload == payload:
+                return
+            sample = Sample(endpoint, self.site_id, datetime.now(timezone.utc), payload)
+            self.latest[endpoint] = sample
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(sample)
+            except Exception:
+                logging.exception(f"subscriber {callback!r} failed")
+
+    def __aiter__(self):
+        return self.aiter()
+
+    async def aiter(self, max_queue=100):
+        # async for sample in stream: ...
+        loop = asyncio.get_running_loop()
+        samples = asyncio.Queue(max_queue)
+        unsubscribe = self.subscribe(
+            lambda sample: loop.call_soon_threadsafe(_offer, samples, sample)
+        )
+        try:
+            while True:
+                yield await samples.get()
+        finally:
+            unsubscribe()
+
+
+def _offer(samples, sample):
+    # a slow subscriber loses its oldest samples, not the newest
+    while True:
+        try:
+            samples.put_nowait(sample)
+            return
+        except (asyncio.QueueFull, queue.Full):
+            try:
+                samples.get_nowait()
+            except (asyncio.QueueEmpty, queue.Empty):
+                pass
+
+
+def serve_sse(
+    streams: Dict[int, ConsumptionStream],
+    port=8765,
+    host="127.0.0.1",
+    allow_origin: Optional[str] = None,
+):
+    # Server-Sent Events: /events for every site, /sites/{site_id}/events for one.
+    # Other origins may only read them when allowed, e.g. "http://localhost:3000"
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            parts = self.path.split("?")[0].strip("/").split("/")
+            if parts == ["events"]:
+                selected = list(streams.values())
+            elif len(parts) == 3 and parts[0] == "sites" and parts[2] == "events":
+                stream = streams.get(int(parts[1])) if parts[1].isdigit() else None
+                selected = [stream] if stream else []
+            else:
+                selected = []
+            if not selected:
+                self.send_error(404)
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            if allow_origin:
+                self.send_header("Access-Control-Allow-Origin", allow_origin)
+            self.end_headers()
+
+            samples = queue.Queue(100)
+            unsubscribes = [
+                stream.subscribe(lambda sample: _offer(samples, sample))
+                for stream in selected
+            ]
+            try:
+                while True:
+                    try:
+                        sample = samples.get(timeout=15)
+                        chunk = (
+                            f"event: {sample.endpoint}\n"
+                            f"data: {dumps(sample.to_dict())}\n\n"
+                        )
+                    except queue.Empty:
+                        chunk = ": keep-alive\n\n"
+                    self.wfile.write(chunk.encode("utf-8"))
+                    self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            finally:
+                for unsubscribe in unsubscribes:
+                    unsubscribe()
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
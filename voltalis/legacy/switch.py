@@ -0,0 +1,74 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+from ..jsonlib import response_json
+
+UNCHANGED = "unchanged"
+UPDATED = "updated"
+FAILED = "failed"
+
+
+@dataclass
+class SwitchResult:
+    site_id: int
+    status: str
+    # csLinkId of the modulators whose state differs (or is unknown)
+    modulators: List[int] = field(default_factory=list)
+    error: Optional[Exception] = None
+
+
+def on_off_status(payload) -> Optional[bool]:
+    # None when the state can not be read from the onOffState payload
+    if isinstance(payload, dict):
+        for key in ("status", "isOn"):
+            if isinstance(payload.get(key), bool):
+                return payload[key]
+    return None
+
+
+def _current_status(cli, site_id, modulator_id) -> Optional[bool]:
+    try:
+        response = cli.onOffState(site_id, modulator_id)
+        response.raise_for_status()
+        return on_off_status(response_json(response))
+    except Exception:
+        return None
+
+
+def _update(cli, result: SwitchResult, turn_on_function: Callable):
+    try:
+        response = cli.updateOnOff(result.site_id, turn_on_function=turn_on_function)
+        response.raise_for_status()
+        result.status = UPDATED
+    except Exception as e:
+        result.status, result.error = FAILED, e
+
+
+def switch_all(cli, turn_on_function: Callable = None, max_workers=8, site_ids=None):
+    # reads the state of every modulator, then sends updateOnOff only for the
+    # sites where a modulator is not in its target state yet
+    if not turn_on_function:
+        turn_on_function = lambda modulator: True
+
+    sites = [site for site in cli.sites() if site_ids is None or site.uid in site_ids]
+    modulators = [
+        (site.uid, modulator) for site in sites for modulator in site.modulators
+    ]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        statuses = executor.map(
+            lambda item: _current_status(cli, item[0], item[1].uid), modulators
+        )
+        results = {site.uid: SwitchResult(site.uid, UNCHANGED) for site in sites}
+        for (site_id, modulator), status in zip(modulators, statuses):
+            if status is None or status != turn_on_function(modulator):
+                results[site_id].modulators.append(modulator.uid)
+
+        futures = [
+            executor.submit(_update, cli, result, turn_on_function)
+            for result in results.values()
+            if result.modulators
+        ]
+        for future in futures:
+            future.result()
+    return list(results.values())
@@ -1,9 +1,12 @@
 import json
+import sys
 import urllib.parse
 from dataclasses import dataclass
 from enum import Enum
 from typing import Any, Callable, List, Optional, Type, TypeVar, cast
 
+from .. import jsonlib
+
 
 class Modulator(object):
     def __init__(self, modulator_json) -> None:
@@ -28,9 +31,7 @@ class TokenEncoder(object):
         self.token = token
 
     def encoded(self):
-        stringified_token = json.dumps(
-            self.token, separators=(",", ":"), ensure_ascii=False
-        )
+        stringified_token = jsonlib.dumps(self.token)
         encoded_token = urllib.parse.quote_plus(stringified_token)
         encoded_token = (
             encoded_token.replace("%21", "!")
@@ -62,6 +63,17 @@ class Token(object):
 
 
 # generated with app.quicktype.io
+# from_dict checks every field unless validation is switched off, in which
+# case the _decode fast path trusts the payload
+_validation = True
+_SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+
+def set_validation(enabled: bool):
+    global _validation
+    _validation = enabled
+
+
 T = TypeVar("T")
 EnumT = TypeVar("EnumT", bound=Enum)
 
@@ -110,7 +122,7 @@ def to_class(c: Type[T], x: Any) -> dict:
     return cast(Any, x).to_dict()
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class Group:
     id: None
     id_sensor: None
@@ -120,6 +132,8 @@ class Group:
 
     @staticmethod
     def from_dict(obj: Any) -> "Group":
+        if not _validation:
+            return Group._decode(obj)
         assert isinstance(obj, dict)
         id = from_union([from_int, from_none], obj.get("id"))
         id_sensor = from_none(obj.get("idSensor"))
@@ -130,6 +144,16 @@ class Group:
         )
         return Group(id, id_sensor, temp, programmation_mode, cs_link_id_list)
 
+    @staticmethod
+    def _decode(obj: Any) -> "Group":
+        return Group(
+            obj.get("id"),
+            obj.get("idSensor"),
+            obj.get("temp"),
+            obj.get("programmationMode"),
+            [ModulatorState._decode(x) for x in obj.get("csLinkIdList", [])],
+        )
+
     def to_dict(self) -> dict:
         result: dict = {}
         result["id"] = from_union([from_int, from_none], self.id)
@@ -161,7 +185,7 @@ class TranslationKey(Enum):
     TEMPERATURE = "temperature"
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class CurrentProgrammationModeElement:
     order: int
     db_id: int
@@ -173,6 +197,8 @@ class CurrentProgrammationModeElement:
 
     @staticmethod
     def from_dict(obj: Any) -> "CurrentProgrammationModeElement":
+        if not _validation:
+            return CurrentProgrammationModeElement._decode(obj)
         assert isinstance(obj, dict)
         order = from_int(obj.get("order"))
         db_id = from_int(obj.get("dbId"))
@@ -193,6 +219,18 @@ class CurrentProgrammationModeElement:
             required_modulator_type_id,
         )
 
+    @staticmethod
+    def _decode(obj: Any) -> "CurrentProgrammationModeElement":
+        return CurrentProgrammationModeElement(
+            obj.get("order"),
+            obj.get("dbId"),
+            ImageName(obj.get("imageName")),
+            TranslationKey(obj.get("translationKey")),
+            obj.get("isEnabled"),
+            obj.get("idRefTypeModulator"),
+            obj.get("requiredModulatorTypeId"),
+        )
+
     def to_dict(self) -> dict:
         result: dict = {}
         result["order"] = from_int(self.order)
@@ -207,7 +245,7 @@ class CurrentProgrammationModeElement:
         return result
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class ModulatorState:
     name: str
     group_id: None
@@ -224,6 +262,8 @@ class ModulatorState:
 
     @staticmethod
     def from_dict(obj: Any) -> "ModulatorState":
+        if not _validation:
+            return ModulatorState._decode(obj)
         assert isinstance(obj, dict)
         name = from_union([from_none, from_str], obj.get("name"))
         group_id = from_none(obj.get("groupId"))
@@ -261,6 +301,32 @@ class ModulatorState:
             setpoint_temperature_in_celsius,
         )
 
+    @staticmethod
+    def _decode(obj: Any) -> "ModulatorState":
+        available_programmation_mode = obj.get(
+            "availableProgrammationMode", obj.get("availableModesForModulator")
+        )
+        # same argument order as from_dict
+        return ModulatorState(
+            obj.get("name"),
+            obj.get("groupId"),
+            obj.get("status"),
+            obj.get("id"),
+            obj.get("idToCut"),
+            obj.get("idCsToCut"),
+            obj.get("idCsLink"),
+            obj.get("isEcoV"),
+            obj.get("modulatorTypeId"),
+            CurrentProgrammationModeElement._decode(
+                obj.get("currentProgrammationMode")
+            ),
+            [
+                CurrentProgrammationModeElement._decode(x)
+                for x in available_programmation_mode
+            ],
+            obj.get("setpointTemperatureInCelsius"),
+        )
+
     def to_dict(self) -> dict:
         result: dict = {}
         result["name"] = from_union([from_none, from_str], self.name)
@@ -285,7 +351,7 @@ class ModulatorState:
         return result
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class ProgrammationMode:
     id: int
     name: str
@@ -296,6 +362,8 @@ class ProgrammationMode:
 
     @staticmethod
     def from_dict(obj: Any) -> "ProgrammationMode":
+        if not _validation:
+            return ProgrammationMode._decode(obj)
         assert isinstance(obj, dict)
         id = from_union([from_int, from_none], (obj.get("id")))
         name = from_str(obj.get("name"))
@@ -305,6 +373,17 @@ class ProgrammationMode:
         targets = from_list(ModulatorState.from_dict, obj.get("targets", []))
         return ProgrammationMode(id, name, type, color, group, targets)
 
+    @staticmethod
+    def _decode(obj: Any) -> "ProgrammationMode":
+        return ProgrammationMode(
+            obj.get("id"),
+            obj.get("name"),
+            obj.get("type"),
+            obj.get("color"),
+            [Group._decode(x) for x in obj.get("group")],
+            [ModulatorState._decode(x) for x in obj.get("targets", [])],
+        )
+
     def to_dict(self) -> dict:
         result: dict = {}
         result["id"] = from_union([from_none, from_int], (self.id))
@@ -318,7 +397,7 @@ class ProgrammationMode:
         return result
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class Mode:
     id: int
     color_mode: str
@@ -326,12 +405,18 @@ class Mode:
 
     @staticmethod
     def from_dict(obj: Any) -> "Mode":
+        if not _validation:
+            return Mode._decode(obj)
         assert isinstance(obj, dict)
         id = from_int(obj.get("id"))
         color_mode = from_str(obj.get("colorMode"))
         label_mode = from_str(obj.get("labelMode"))
         return Mode(id, color_mode, label_mode)
 
+    @staticmethod
+    def _decode(obj: Any) -> "Mode":
+        return Mode(obj.get("id"), obj.get("colorMode"), obj.get("labelMode"))
+
     def to_dict(self) -> dict:
         result: dict = {}
         result["id"] = from_int(self.id)
@@ -340,7 +425,7 @@ class Mode:
         return result
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class Datum:
     time_begin: str
     time_end: str
@@ -348,12 +433,20 @@ class Datum:
 
     @staticmethod
     def from_dict(obj: Any) -> "Datum":
+        if not _validation:
+            return Datum._decode(obj)
         assert isinstance(obj, dict)
         time_begin = from_str(obj.get("timeBegin"))
         time_end = from_str(obj.get("timeEnd"))
         mode = Mode.from_dict(obj.get("mode"))
         return Datum(time_begin, time_end, mode)
 
+    @staticmethod
+    def _decode(obj: Any) -> "Datum":
+        return Datum(
+            obj.get("timeBegin"), obj.get("timeEnd"), Mode._decode(obj.get("mode"))
+        )
+
     def to_dict(self) -> dict:
         result: dict = {}
         result["timeBegin"] = from_str(self.time_begin)
@@ -362,18 +455,24 @@ class Datum:
         return result
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class DayOfWeek:
     id_day: int
     day_is_on: bool
 
     @staticmethod
     def from_dict(obj: Any) -> "DayOfWeek":
+        if not _validation:
+            return DayOfWeek._decode(obj)
         assert isinstance(obj, dict)
         id_day = from_int(obj.get("idDay"))
         day_is_on = from_bool(obj.get("dayIsOn"))
         return DayOfWeek(id_day, day_is_on)
 
+    @staticmethod
+    def _decode(obj: Any) -> "DayOfWeek":
+        return DayOfWeek(obj.get("idDay"), obj.get("dayIsOn"))
+
     def to_dict(self) -> dict:
         result: dict = {}
         result["idDay"] = from_int(self.id_day)
@@ -381,7 +480,7 @@ class DayOfWeek:
         return result
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class Scheduler:
     id: None
     name: str
@@ -392,6 +491,8 @@ class Scheduler:
 
     @staticmethod
     def from_dict(obj: Any) -> "Scheduler":
+        if not _validation:
+            return Scheduler._decode(obj)
         assert isinstance(obj, dict)
         id = from_union([from_int, from_none], obj.get("id"))
         name = from_str(obj.get("name"))
@@ -401,6 +502,17 @@ class Scheduler:
         day_of_week = from_list(DayOfWeek.from_dict, obj.get("dayOfWeek"))
         return Scheduler(id, name, is_active, is_exception, data, day_of_week)
 
+    @staticmethod
+    def _decode(obj: Any) -> "Scheduler":
+        return Scheduler(
+            obj.get("id"),
+            obj.get("name"),
+            obj.get("isActive"),
+            obj.get("isException"),
+            [Datum._decode(x) for x in obj.get("data")],
+            [DayOfWeek._decode(x) for x in obj.get("dayOfWeek")],
+        )
+
     def to_dict(self) -> dict:
         result: dict = {}
         result["id"] = from_none(self.id)
@@ -0,0 +1,101 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class SingleFlight(object):
+    # concurrent calls with the same key share the result of the first one.
+    # The clients key their GETs on what identifies the request, so that
+    # identical GETs in flight at the same time make one request, and their
+    # callers share its response and parsed body. Mutations, and the GETs
+    # with side effects, are never coalesced
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, function, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            return call.wait()
+
+        try:
+            call.result = function(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+class _Call(object):
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def wait(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class TTLCache(object):
+    # bounded LRU mapping whose entries expire after ttl seconds
+    def __init__(self, max_entries=256, ttl=300) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._flight = SingleFlight()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires, value = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, key, function, *args):
+        missing = object()
+        value = self.get(key, missing)
+        if value is not missing:
+            return value
+
+        def compute():
+            value = function(*args)
+            self.set(key, value)
+            return value
+
+        return self._flight.do(key, compute)
+
+    def invalidate(self, predicate=None):
+        with self._lock:
+            if predicate is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
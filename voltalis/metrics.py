@@ -0,0 +1,257 @@
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Optional
+from urllib.parse import urlsplit
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+_hooks = []
+# connection timings of the request in flight on this thread
+_local = threading.local()
+_IDS = re.compile(r"(?<=/)\d[\d-]*(?=/|$)")
+
+
+@dataclass
+class RequestMetrics:
+    client: str
+    method: str
+    endpoint: str
+    status: Optional[int] = None
+    # seconds; connect (DNS and TCP) and tls are None on a reused connection
+    connect: Optional[float] = None
+    tls: Optional[float] = None
+    ttfb: Optional[float] = None
+    total: Optional[float] = None
+    size: int = 0
+    retries: int = 0
+    from_cache: bool = False
+    error: Optional[str] = None
+
+    def observe(self, response):
+        self.status = response.status_code
+        self.size = len(response.content)
+        self.from_cache = getattr(response, "from_cache", False)
+        if self.from_cache:
+            return
+        # requests stops this clock once the response headers are parsed
+        self.ttfb = response.elapsed.total_seconds()
+        retries = getattr(response.raw, "retries", None)
+        self.retries = len(retries.history) if retries else 0
+
+
+@dataclass
+class ParseMetrics:
+    size: int
+    duration: float
+
+
+def add_hook(hook):
+    # hook(record) is called with a RequestMetrics after each request, and a
+    # ParseMetrics after each response body is decoded
+    _hooks.append(hook)
+
+
+def remove_hook(hook):
+    _hooks.remove(hook)
+
+
+def enabled():
+    return bool(_hooks)
+
+
+def emit(record):
+    for hook in list(_hooks):
+        try:
+            hook(record)
+        except Exception:
+            logging.exception(f"metrics hook {hook!r} failed")
+
+
+def endpoint(url: str) -> str:
+    # api/site/123/consumption/week/2022-01-03 -> api/site/{id}/consumption/week/{id}
+    return _IDS.sub("{id}", urlsplit(url).path.lstrip("/"))
+
+
+@contextmanager
+def measure(client: str, method: str, url: str):
+    record = RequestMetrics(client, method, endpoint(url))
+    _local.connect = _local.tls = None
+    started = time.perf_counter()
+    try:
+        yield record
+    except Exception as e:
+        record.error = type(e).__name__
+        raise
+    finally:
+        record.total = time.perf_counter() - started
+        record.connect, record.tls = _local.connect, _local.tls
+        emit(record)
+
+
+def request(client: str, requester, method: str, url: str, **kwargs):
+    # requester.request(method, url, **kwargs), measured when a hook is installed
+    if not _hooks:
+        return requester.request(method, url, **kwargs)
+    with measure(client, method, url) as record:
+        response = requester.request(method, url, **kwargs)
+        record.observe(response)
+    return response
+
+
+class _TimedConnection(object):
+    def _new_conn(self):
+        started = time.perf_counter()
+        sock = super()._new_conn()
+        _local.connect = time.perf_counter() - started
+        return sock
+
+
+class TimedHTTPConnection(_TimedConnection, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(_TimedConnection, HTTPSConnection):
+    def connect(self):
+        started = time.perf_counter()
+        super().connect()
+        _local.tls = time.perf_counter() - started - (_local.connect or 0)
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    # records the connect and TLS handshake durations of new connections
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": TimedHTTPConnectionPool,
+            "https": TimedHTTPSConnectionPool,
+        }
+
+
+class PrometheusExporter(object):
+    # a metrics hook aggregating the records in the OpenMetrics text format
+    CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+    def __init__(self, buckets=BUCKETS) -> None:
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+    def __call__(self, record):
+        with self._lock:
+            if isinstance(record, ParseMetrics):
+                self._observe("voltalis_parse_seconds", (), record.duration)
+                return
+            labels = (
+                ("client", record.client),
+                ("method", record.method),
+                ("endpoint", record.endpoint),
+            )
+            status = record.error or str(record.status)
+            cache = "hit" if record.from_cache else "miss"
+            self._inc(
+                "voltalis_requests", labels + (("status", status), ("cache", cache))
+            )
+            self._inc("voltalis_response_bytes", labels, record.size)
+            self._inc("voltalis_retries", labels, record.retries)
+            if record.from_cache:
+                return
+            for phase in ("connect", "tls", "ttfb", "total"):
+                value = getattr(record, phase)
+                if value is not None:
+                    self._observe(
+                        "voltalis_request_seconds", labels + (("phase", phase),), value
+                    )
+
+    def _inc(self, name, labels, value=1):
+        key = (name, labels)
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def _observe(self, name, labels, value):
+        # one count per bucket, then the sum and the count
+        counts = self._histograms.setdefault(
+            (name, labels), [0] * len(self.buckets) + [0.0, 0]
+        )
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[index] += 1
+        counts[-2] += value
+        counts[-1] += 1
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for name in sorted({name for name, _ in self._counters}):
+                lines.append(f"# TYPE {name} counter")
+                for (key, labels), value in sorted(self._counters.items()):
+                    if key == name:
+                        lines.append(f"{name}_total{_labels(labels)} {value}")
+            for name in sorted({name for name, _ in self._histograms}):
+                lines.append(f"# TYPE {name} histogram")
+                for (key, labels), counts in sorted(self._histograms.items()):
+                    if key != name:
+                        continue
+                    for bound, count in zip(self.buckets, counts):
+                        bucket = labels + (("le", str(bound)),)
+                        lines.append(f"{name}_bucket{_labels(bucket)} {count}")
+                    bucket = labels + (("le", "+Inf"),)
+                    lines.append(f"{name}_bucket{_labels(bucket)} {counts[-1]}")
+                    lines.append(f"{name}_sum{_labels(labels)} {counts[-2]}")
+                    lines.append(f"{name}_count{_labels(labels)} {counts[-1]}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        # for the textfile collector of the node exporter
+        temporary = f"{path}.tmp"
+        with open(temporary, "w") as fd:
+            fd.write(self.render())
+        os.replace(temporary, path)
+
+    def serve(self, port=9464, host="127.0.0.1"):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = exporter.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", exporter.CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+def _labels(labels) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (name, value.replace("\\", "\\\\").replace('"', '\\"'))
+        for name, value in labels
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
@@ -1,39 +1,70 @@
-from datetime import datetime, timedelta
+from datetime import datetime
+from itertools import chain, islice
 
-import dateutil
 import pandas as pd
-import requests_cache
 
-from . import VoltalisClient
+from .client import VoltalisClient
+from .consumption import ConsumptionSeries, fetch_consumptions, iter_consumption
 
 
-requests_cache.install_cache("example_cache", backend="sqlite")
+def consumptions_to_dataframe(*consumption_lists) -> pd.DataFrame:
+    # one or several raw "consumptions" lists, as returned by the API
+    consumptions = list(chain.from_iterable(consumption_lists))
+    timestamps = [cons["stepTimestampInUtc"] for cons in consumptions]
+    watts = [cons["totalConsumptionInWh"] for cons in consumptions]
+
+    index = pd.DatetimeIndex(pd.to_datetime(timestamps, utc=True), name="time")
+    conso_df = pd.DataFrame({"watts": pd.to_numeric(watts)}, index=index)
+    return conso_df.sort_index()
 
 
 def get_consumption_stats_per_hour_as_dataframe(
-    username: str, password: str, start: datetime, end: datetime
+    username: str,
+    password: str,
+    start: datetime,
+    end: datetime,
+    max_workers=4,
+    store=None,
+    cache=None,
+    token_store=None,
 ):
-    dates = pd.date_range(start, end - timedelta(days=1), freq="d").tolist()
-    cli = VoltalisClient(username, password)
+    cli = VoltalisClient(username, password, cache=cache, token_store=token_store)
     cli.login()
     me = cli.me()
     site_id = me.get("defaultSite", {}).get("id")
 
-    cumulated_data = {"totalConsumption": 0, "consumptions": []}
-    for day in dates:
-        data = cli.consumption_stats_per_hour(site_id, day)
-        cumulated_data["totalConsumption"] += data["totalConsumption"]
-        cumulated_data["consumptions"].extend(data["consumptions"])
-
-    conso_data = {
-        "kWh": {
-            dateutil.parser.parse(cons["stepTimestampInUtc"]): cons[
-                "totalConsumptionInWh"
-            ]
-            for cons in cumulated_data.get("consumptions")
-        }
-    }
-
-    conso_df = pd.DataFrame(conso_data["kWh"].items(), columns=["time", "watts"])
-    conso_df.set_index("time")
-    return conso_df
+    cumulated_data = fetch_consumptions(cli, site_id, start, end, max_workers, store)
+    return consumptions_to_dataframe(cumulated_data["consumptions"])
+
+
+def steps_to_dataframe(steps) -> pd.DataFrame:
+    # ConsumptionStep records, e.g. from voltalis.consumption.iter_consumption
+    return ConsumptionSeries(steps).to_dataframe()
+
+
+def iter_consumption_frames(
+    cli: VoltalisClient, site_id: int, start, end, chunk_size=24 * 7, max_workers=4
+):
+    steps = iter_consumption(cli, site_id, start, end, max_workers)
+    while True:
+        chunk = ConsumptionSeries(islice(steps, chunk_size))
+        if not chunk:
+            return
+        yield chunk.to_dataframe()
+
+
+def write_parquet(frames, path):
+    # requires pyarrow
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for frame in frames:
+            table = pa.Table.from_pandas(frame)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
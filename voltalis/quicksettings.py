@@ -0,0 +1,80 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+UNCHANGED = "unchanged"
+UPDATED = "updated"
+MISSING = "missing"
+FAILED = "failed"
+
+
+@dataclass
+class QuicksettingResult:
+    site_id: int
+    quicksetting_id: int
+    status: str
+    changes: Dict[str, object] = field(default_factory=dict)
+    error: Optional[Exception] = None
+
+
+def diff_quicksetting(current: dict, desired: dict) -> dict:
+    # the desired fields whose value differs from the current one
+    return {key: value for key, value in desired.items() if current.get(key) != value}
+
+
+def apply_quicksettings(cli, desired: dict, max_workers=8) -> List[QuicksettingResult]:
+    # desired: {site_id: {quicksetting_id: {"enabled": True, ...}}}
+    # one GET per site, then one PUT per quicksetting that actually changes
+    site_ids = list(desired)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        current_by_site = dict(
+            zip(site_ids, executor.map(_get_quicksettings(cli), site_ids))
+        )
+
+        results = []
+        updates = []
+        for site_id, quicksettings in desired.items():
+            current = current_by_site[site_id]
+            for quicksetting_id, fields in quicksettings.items():
+                result = QuicksettingResult(site_id, quicksetting_id, UNCHANGED)
+                results.append(result)
+                if isinstance(current, Exception):
+                    result.status, result.error = FAILED, current
+                elif quicksetting_id not in current:
+                    result.status = MISSING
+                else:
+                    result.changes = diff_quicksetting(current[quicksetting_id], fields)
+                    if result.changes:
+                        payload = dict(current[quicksetting_id], **result.changes)
+                        updates.append((result, payload))
+
+        for future in [
+            executor.submit(_put, cli, result, payload) for result, payload in updates
+        ]:
+            future.result()
+    return results
+
+
+def _get_quicksettings(cli):
+    # the current state is read past the response cache, a stale one could
+    # skip a needed PUT or revert a recent change
+    def get(site_id):
+        try:
+            return {
+                quicksetting["id"]: quicksetting
+                for quicksetting in cli.get_quicksettings(site_id, fresh=True)
+            }
+        except Exception as e:
+            return e
+
+    return get
+
+
+def _put(cli, result: QuicksettingResult, payload: dict):
+    try:
+        cli.put_quicksetting(
+            result.site_id, result.quicksetting_id, payload, check=True
+        )
+        result.status = UPDATED
+    except Exception as e:
+        result.status, result.error = FAILED, e
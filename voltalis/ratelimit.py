@@ -0,0 +1,238 @@
+import asyncio
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from urllib.parse import urlsplit
+
+# statuses telling that the backend is overloaded or throttling us
+THROTTLE_STATUSES = (429, 503)
+# requests per second and burst of each host; unlimited unless
+# VOLTALIS_RATE_LIMIT is set or configure() is given a rate
+DEFAULT_RATE = float(os.environ.get("VOLTALIS_RATE_LIMIT") or 0) or None
+DEFAULT_BURST = 40
+
+
+class TokenBucket(object):
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST) -> None:
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        # no token is handed out before this time (Retry-After)
+        self._paused_until = 0
+        self._lock = threading.Lock()
+
+    def _take(self):
+        # takes a token, or returns the seconds to wait before trying again
+        with self._lock:
+            now = time.monotonic()
+            if not self.rate:
+                # unlimited, only Retry-After holds the requests back
+                return max(0, self._paused_until - now)
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            if now >= self._paused_until and self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return max(self._paused_until - now, (1 - self._tokens) / self.rate)
+
+    def acquire(self):
+        wait = self._take()
+        while wait:
+            time.sleep(wait)
+            wait = self._take()
+
+    async def acquire_async(self):
+        wait = self._take()
+        while wait:
+            await asyncio.sleep(wait)
+            wait = self._take()
+
+    def pause(self, seconds):
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class AdaptiveConcurrency(object):
+    # AIMD: the limit grows by one per limit's worth of healthy responses and
+    # is multiplied by decrease on a throttling response, at most once per
+    # cooldown so that one burst of 429 counts as one signal
+    def __init__(
+        self,
+        initial=8,
+        minimum=1,
+        maximum=64,
+        decrease=0.5,
+        cooldown=1.0,
+        latency_target=None,
+    ) -> None:
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.latency_target = latency_target
+        self.in_flight = 0
+        self._decreased_at = float("-inf")
+        self._condition = threading.Condition()
+        # (loop, future) of the coroutines waiting for a slot
+        self._waiters = []
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    async def acquire_async(self):
+        # the event loop is not blocked: release() wakes the waiting coroutines
+        # from whichever thread it runs on
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._condition:
+                if self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return
+                waiter = (loop, loop.create_future())
+                self._waiters.append(waiter)
+            try:
+                await waiter[1]
+            finally:
+                with self._condition:
+                    if waiter in self._waiters:
+                        self._waiters.remove(waiter)
+
+    def release(self, throttled=False, healthy=True):
+        with self._condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if throttled:
+                if now - self._decreased_at >= self.cooldown:
+                    self.limit = max(self.minimum, self.limit * self.decrease)
+                    self._decreased_at = now
+            elif healthy:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+            waiters, self._waiters = self._waiters, []
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_wake, future)
+
+    def is_healthy(self, status, latency):
+        if status >= 500:
+            return False
+        return self.latency_target is None or latency <= self.latency_target
+
+
+class HostLimiter(object):
+    def __init__(self, bucket: TokenBucket, concurrency: AdaptiveConcurrency) -> None:
+        self.bucket = bucket
+        self.concurrency = concurrency
+
+    @contextmanager
+    def slot(self):
+        # with limiter.slot() as done: response = ...; done(response)
+        self.bucket.acquire()
+        self.concurrency.acquire()
+        started = time.monotonic()
+        outcome = {}
+
+        def done(response):
+            outcome["response"] = response
+
+        try:
+            yield done
+        finally:
+            response = outcome.get("response")
+            if response is None:
+                self.concurrency.release(healthy=False)
+            else:
+                self._release(response, time.monotonic() - started)
+
+    @asynccontextmanager
+    async def async_slot(self):
+        # slot() for coroutines, done(response) takes an aiohttp response
+        await self.bucket.acquire_async()
+        await self.concurrency.acquire_async()
+        started = time.monotonic()
+        outcome = {}
+
+        def done(response):
+            outcome["response"] = response
+
+        try:
+            yield done
+        finally:
+            response = outcome.get("response")
+            if response is None:
+                self.concurrency.release(healthy=False)
+            else:
+                self._observe(
+                    [response.status],
+                    response.headers.get("Retry-After", ""),
+                    time.monotonic() - started,
+                )
+
+    def _release(self, response, latency):
+        statuses = [response.status_code]
+        # throttling answers retried by urllib3 do not reach the caller
+        retries = getattr(getattr(response, "raw", None), "retries", None)
+        if retries:
+            statuses += [attempt.status for attempt in retries.history]
+        self._observe(statuses, response.headers.get("Retry-After", ""), latency)
+
+    def _observe(self, statuses, retry_after, latency):
+        # statuses: the final one first, then the ones retried on the way
+        throttled = any(status in THROTTLE_STATUSES for status in statuses)
+        if throttled and retry_after.isdigit():
+            self.bucket.pause(int(retry_after))
+        self.concurrency.release(
+            throttled=throttled,
+            healthy=self.concurrency.is_healthy(statuses[0], latency),
+        )
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def configure(
+    host, rate=DEFAULT_RATE, burst=DEFAULT_BURST, **concurrency
+) -> HostLimiter:
+    # replaces the limiter of a host, e.g. configure("api.myvoltalis.com", rate=5);
+    # rate=None leaves the request rate unlimited
+    limiter = HostLimiter(TokenBucket(rate, burst), AdaptiveConcurrency(**concurrency))
+    with _limiters_lock:
+        _limiters[host] = limiter
+    return limiter
+
+
+def limiter_for(url) -> HostLimiter:
+    # one limiter per host, shared by every client of the process
+    host = urlsplit(url).netloc
+    with _limiters_lock:
+        limiter = _limiters.get(host)
+        if limiter is None:
+            limiter = _limiters[host] = HostLimiter(
+                TokenBucket(), AdaptiveConcurrency()
+            )
+        return limiter
+
+
+@contextmanager
+def slot(url):
+    with limiter_for(url).slot() as done:
+        yield done
+
+
+@asynccontextmanager
+async def async_slot(url):
+    async with limiter_for(url).async_slot() as done:
+        yield done
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
@@ -0,0 +1,49 @@
+from http.cookiejar import DefaultCookiePolicy
+
+import requests
+from urllib3.util.retry import Retry
+
+from .metrics import TimedHTTPAdapter
+
+DEFAULT_TIMEOUT = (3.05, 30)
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def create_session(
+    pool_connections=10,
+    pool_maxsize=10,
+    pool_block=False,
+    max_retries=3,
+    backoff_factor=0.5,
+    status_forcelist=RETRY_STATUSES,
+    keep_alive=True,
+) -> requests.Session:
+    # pool_connections: number of hosts kept in the pool
+    # pool_maxsize: connections kept alive per host
+    # pool_block: wait for a free connection instead of opening a throwaway one
+    retry = Retry(
+        total=max_retries,
+        connect=max_retries,
+        read=max_retries,
+        status=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=status_forcelist,
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = TimedHTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        pool_block=pool_block,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    if not keep_alive:
+        session.headers["Connection"] = "close"
+    # the jar keeps no cookie: clients of different accounts may share the
+    # session, the legacy client sends its cookies with each request
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    return session
@@ -0,0 +1,127 @@
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+
+from .consumption import ConsumptionSeries, ConsumptionStep, as_utc, parse_timestamp
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS consumption (
+    site_id INTEGER NOT NULL,
+    hour INTEGER NOT NULL,
+    step TEXT NOT NULL,
+    wh REAL,
+    PRIMARY KEY (site_id, hour)
+);
+CREATE TABLE IF NOT EXISTS coverage (
+    site_id INTEGER NOT NULL,
+    start INTEGER NOT NULL,
+    end INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS coverage_site ON coverage (site_id, start);
+"""
+
+
+def _epoch(moment) -> int:
+    return int(as_utc(moment).timestamp())
+
+
+def _datetime(epoch: int) -> datetime:
+    return datetime.fromtimestamp(epoch, tz=timezone.utc)
+
+
+class ConsumptionStore(object):
+    # hourly steps keyed by (site_id, hour), plus the intervals already fetched
+    # from the API. Steps newer than now - settle may still change upstream:
+    # they are stored but their interval is not marked as covered.
+    def __init__(self, path="voltalis-consumption.sqlite", settle=timedelta(days=1)):
+        self.path = path
+        self.settle = settle
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+
+    def close(self):
+        self._db.close()
+
+    def _coverage(self, site_id: int):
+        return self._db.execute(
+            "SELECT start, end FROM coverage WHERE site_id = ? ORDER BY start",
+            (site_id,),
+        ).fetchall()
+
+    def missing_intervals(self, site_id: int, start, end):
+        lower, upper = _epoch(start), _epoch(end)
+        gaps = []
+        with self._lock:
+            coverage = self._coverage(site_id)
+        for covered_start, covered_end in coverage:
+            if covered_end <= lower:
+                continue
+            if covered_start >= upper:
+                break
+            if covered_start > lower:
+                gaps.append((lower, covered_start))
+            lower = max(lower, covered_end)
+        if lower < upper:
+            gaps.append((lower, upper))
+        return [
+            (_datetime(gap_start), _datetime(gap_end)) for gap_start, gap_end in gaps
+        ]
+
+    def save(self, site_id: int, intervals, consumptions):
+        rows = [
+            (
+                site_id,
+                int(parse_timestamp(cons["stepTimestampInUtc"]).timestamp()),
+                cons["stepTimestampInUtc"],
+                cons["totalConsumptionInWh"],
+            )
+            for cons in consumptions
+        ]
+        settled = _epoch(datetime.now(timezone.utc) - self.settle)
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO consumption VALUES (?, ?, ?, ?)", rows
+            )
+            intervals = [
+                (_epoch(start), min(_epoch(end), settled)) for start, end in intervals
+            ]
+            self._db.executemany(
+                "INSERT INTO coverage VALUES (?, ?, ?)",
+                [(site_id, start, end) for start, end in intervals if start < end],
+            )
+            self._merge_coverage(site_id)
+
+    def _merge_coverage(self, site_id: int):
+        merged = []
+        for start, end in self._coverage(site_id):
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        self._db.execute("DELETE FROM coverage WHERE site_id = ?", (site_id,))
+        self._db.executemany(
+            "INSERT INTO coverage VALUES (?, ?, ?)",
+            [(site_id, start, end) for start, end in merged],
+        )
+
+    def load(self, site_id: int, start, end):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT step, wh FROM consumption"
+                " WHERE site_id = ? AND hour >= ? AND hour < ? ORDER BY hour",
+                (site_id, _epoch(start), _epoch(end)),
+            ).fetchall()
+        return [
+            {"stepTimestampInUtc": step, "totalConsumptionInWh": wh}
+            for step, wh in rows
+        ]
+
+    def load_series(self, site_id: int, start, end) -> ConsumptionSeries:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT hour, wh FROM consumption"
+                " WHERE site_id = ? AND hour >= ? AND hour < ? ORDER BY hour",
+                (site_id, _epoch(start), _epoch(end)),
+            )
+            return ConsumptionSeries(ConsumptionStep(hour, wh) for hour, wh in rows)
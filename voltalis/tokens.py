@@ -0,0 +1,83 @@
+import base64
+import json
+import os
+import threading
+import time
+from typing import Optional
+
+DEFAULT_PATH = os.path.join("~", ".voltalis", "sessions.json")
+
+
+class TokenStore(object):
+    # bearer tokens and cookies of past logins, in a JSON file readable by
+    # its owner only. Both clients take one as token_store, to skip the login
+    # across runs
+    def __init__(self, path=DEFAULT_PATH) -> None:
+        self.path = os.path.expanduser(path)
+        self._lock = threading.Lock()
+
+    def _read(self) -> dict:
+        try:
+            with open(self.path) as fd:
+                return json.load(fd)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _write(self, sessions: dict):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+        temporary = f"{self.path}.tmp"
+        fd = os.open(temporary, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as fp:
+            json.dump(sessions, fp)
+        os.replace(temporary, self.path)
+
+    def load(self, key: str) -> Optional[dict]:
+        with self._lock:
+            return self._read().get(key)
+
+    def save(self, key: str, session: dict):
+        with self._lock:
+            sessions = self._read()
+            sessions[key] = dict(session, obtained_at=time.time())
+            self._write(sessions)
+
+    def delete(self, key: str):
+        with self._lock:
+            sessions = self._read()
+            if sessions.pop(key, None) is not None:
+                self._write(sessions)
+
+
+class Relogin(object):
+    # relogin(stale_token) logs the client in again, once for all the threads
+    # holding the same stale token: the ones queued behind the login find the
+    # token replaced and use the new one
+    def __init__(self, client) -> None:
+        self.client = client
+        self._lock = threading.Lock()
+
+    def __call__(self, stale_token):
+        with self._lock:
+            if self.client.token is stale_token:
+                self.client.login(force=True)
+
+
+def token_expiry(token) -> Optional[float]:
+    # the exp claim of a JWT, None when the token is opaque
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return float(json.loads(base64.urlsafe_b64decode(payload))["exp"])
+    except (AttributeError, IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+def expires_at(session: dict, token, max_age=None) -> Optional[float]:
+    # the earliest of the JWT expiry and obtained_at + max_age
+    deadlines = [token_expiry(token)]
+    if max_age is not None:
+        deadlines.append(session.get("obtained_at", 0) + max_age)
+    deadlines = [deadline for deadline in deadlines if deadline is not None]
+    return min(deadlines) if deadlines else None